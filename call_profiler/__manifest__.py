@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+{
+    "name": "Call Profiler",
+    'version': '18.0.1.0.0',
+    'category': 'Technical',
+    "summary": "Query count and timing statistics of instrumented methods",
+    'description': "Records SQL queries, ORM cache misses and wall time of "
+                   "the methods decorated with @profiled, when enabled by "
+                   "the call_profiler.enabled system parameter.",
+    'author': 'Rinoy',
+    'depends': ['base'],
+    'data': [
+        "security/ir.model.access.csv",
+        "data/ir_cron.xml",
+        "views/call_profile_stat_views.xml",
+    ],
+    'license': 'LGPL-3',
+    'installable': True,
+    'auto_install': False,
+    'application': False,
+}
@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+from odoo import http
+from odoo.http import request
+
+
+class CallProfilerController(http.Controller):
+
+    @http.route('/call_profiler/stats', type='http', auth='user', methods=['GET'])
+    def call_profile_stats(self, since=None, **kwargs):
+        if not request.env.user.has_group('base.group_system'):
+            raise request.not_found()
+        stats = request.env['call.profile.stat'].get_stats(since=since)
+        return request.make_json_response(stats, headers=[('Cache-Control', 'no-store')])
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+from odoo import api, fields, models
+
+from ..profiler import flush
+
+RETENTION_PARAM = 'call_profiler.retention_days'
+
+
+class CallProfileStat(models.Model):
+    _name = "call.profile.stat"
+    _description = "Call Profiling Statistics"
+    _order = "create_date desc, id desc"
+
+    name = fields.Char(string="Call", required=True, index=True, readonly=True)
+    call_count = fields.Integer(string="Calls", readonly=True)
+    duration_ms = fields.Float(string="Total Time (ms)", readonly=True)
+    max_duration_ms = fields.Float(
+        string="Max Time (ms)", readonly=True, aggregator='max')
+    query_count = fields.Integer(string="Queries", readonly=True)
+    cache_miss_count = fields.Integer(string="Cache Misses", readonly=True)
+    slow_count = fields.Integer(string="Slow Calls", readonly=True)
+
+    @api.model
+    def _store(self, pending):
+        """Insert one row per call name of the measures of a process."""
+        self.create([{
+            'name': name,
+            'call_count': calls,
+            'duration_ms': duration_ms,
+            'max_duration_ms': max_duration_ms,
+            'query_count': queries,
+            'cache_miss_count': misses,
+            'slow_count': slow_calls,
+        } for name, (calls, duration_ms, max_duration_ms, queries, misses, slow_calls)
+            in pending.items()])
+
+    @api.model
+    def get_stats(self, since=None):
+        """Return the statistics aggregated per call name, slowest first.
+
+        :param since: optional datetime (or string) to restrict the
+                      statistics to the calls measured after it
+        """
+        flush(self.env.registry)
+        domain = [('create_date', '>=', since)] if since else []
+        groups = self._read_group(
+            domain,
+            groupby=['name'],
+            aggregates=['call_count:sum', 'duration_ms:sum', 'max_duration_ms:max',
+                        'query_count:sum', 'cache_miss_count:sum', 'slow_count:sum'],
+            order='duration_ms:sum desc',
+        )
+        return [{
+            'name': name,
+            'calls': calls,
+            'total_ms': round(duration_ms, 1),
+            'avg_ms': round(duration_ms / calls, 1) if calls else 0.0,
+            'max_ms': round(max_duration_ms, 1),
+            'avg_queries': round(queries / calls, 1) if calls else 0.0,
+            'avg_cache_misses': round(misses / calls, 1) if calls else 0.0,
+            'slow_calls': slow_calls,
+        } for name, calls, duration_ms, max_duration_ms, queries, misses, slow_calls in groups]
+
+    @api.model
+    def _cron_cleanup(self):
+        flush(self.env.registry)
+        days = int(self.env['ir.config_parameter'].sudo().get_param(RETENTION_PARAM, 30))
+        self.search([
+            ('create_date', '<', fields.Datetime.now() - timedelta(days=days)),
+        ]).unlink()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""Lightweight per-call instrumentation.
+
+Decorate a model method with :func:`profiled`, or wrap a block with
+:func:`profile_call`, to record its SQL query count, ORM cache misses and
+wall time. Nothing is measured unless the ``call_profiler.enabled`` system
+parameter is set. Measures are aggregated in memory and periodically stored
+as ``call.profile.stat`` rows through a separate cursor, so the profiled
+transaction is neither slowed down nor affected by a rollback.
+"""
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from odoo import api, SUPERUSER_ID
+from odoo.tools.cache import STAT
+
+_logger = logging.getLogger(__name__)
+
+ENABLED_PARAM = 'call_profiler.enabled'
+SLOW_THRESHOLD_PARAM = 'call_profiler.slow_threshold_ms'
+DEFAULT_SLOW_THRESHOLD_MS = 1000.0
+# Seconds between two writes of the in-memory measures of a process.
+FLUSH_INTERVAL = 60.0
+
+_lock = threading.Lock()
+# (dbname, name) -> [calls, duration_ms, max_duration_ms, queries, cache_misses, slow_calls]
+_pending = {}
+_last_flush = {}
+
+
+def is_enabled(env):
+    return bool(env['ir.config_parameter'].sudo().get_param(ENABLED_PARAM))
+
+
+def _cache_misses(dbname):
+    return sum(counter.miss for key, counter in list(STAT.items()) if key[0] == dbname)
+
+
+@contextmanager
+def profile_call(env, name):
+    """Measure the enclosed block as one call of ``name``."""
+    if not is_enabled(env):
+        yield
+        return
+    cr = env.cr
+    dbname = cr.dbname
+    queries = cr.sql_log_count
+    misses = _cache_misses(dbname)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        queries = cr.sql_log_count - queries
+        misses = _cache_misses(dbname) - misses
+        threshold = float(env['ir.config_parameter'].sudo().get_param(
+            SLOW_THRESHOLD_PARAM, DEFAULT_SLOW_THRESHOLD_MS))
+        slow = duration_ms >= threshold
+        if slow:
+            _logger.warning(
+                "Slow call %s: %.1f ms, %s queries, %s cache misses",
+                name, duration_ms, queries, misses)
+        _record(env, name, duration_ms, queries, misses, slow)
+
+
+def profiled(name=None):
+    """Decorator profiling each call of a model method with
+    :func:`profile_call`, under ``name`` or ``<model>.<method>``."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not is_enabled(self.env):
+                return method(self, *args, **kwargs)
+            with profile_call(self.env, name or '%s.%s' % (self._name, method.__name__)):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _record(env, name, duration_ms, queries, misses, slow):
+    dbname = env.cr.dbname
+    now = time.monotonic()
+    with _lock:
+        stats = _pending.setdefault((dbname, name), [0, 0.0, 0.0, 0, 0, 0])
+        stats[0] += 1
+        stats[1] += duration_ms
+        stats[2] = max(stats[2], duration_ms)
+        stats[3] += queries
+        stats[4] += misses
+        stats[5] += int(slow)
+        due = now - _last_flush.setdefault(dbname, now) >= FLUSH_INTERVAL
+    if due:
+        flush(env.registry)
+
+
+def flush(registry):
+    """Store the pending measures of ``registry``'s database."""
+    dbname = registry.db_name
+    with _lock:
+        pending = {
+            name: _pending.pop((db, name))
+            for db, name in list(_pending)
+            if db == dbname
+        }
+        _last_flush[dbname] = time.monotonic()
+    if not pending:
+        return
+    try:
+        with registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            env['call.profile.stat']._store(pending)
+    except Exception:
+        _logger.exception("Could not store call profiling statistics")
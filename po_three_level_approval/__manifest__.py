@@ -1,16 +1,19 @@
 # -*- coding: utf-8 -*-
 {
     "name": "Purchase Order Approval",
-    'version': '18.0.1.0.0',
+    'version': '18.0.1.1.0',
     'category': 'Purchase',
     "summary": "Three Level Purchase Order Approval",
     'description': "Three Levels of Approval in Purchase work flow",
     'author': 'Rinoy',
-    'depends': ['base', 'purchase', 'purchase_stock'],
+    'depends': ['base', 'purchase', 'purchase_stock', 'call_profiler'],
     'data': [
         "security/security.xml",
+        "security/ir.model.access.csv",
         "data/approval_mail.xml",
         "views/purchase_order.xml",
+        "views/purchase_approval_threshold_views.xml",
+        "views/purchase_approval_queue_views.xml",
     ],
     'license': 'LGPL-3',
     'installable': True,
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+from odoo import http
+from odoo.http import request
+
+
+class PurchaseApprovalController(http.Controller):
+
+    @http.route('/po_three_level_approval/queue', type='http', auth='user', methods=['GET'])
+    def approval_queue_stats(self, **kwargs):
+        stats = request.env['purchase.order'].get_approval_queue_stats()
+        return request.make_json_response(stats, headers=[('Cache-Control', 'no-store')])
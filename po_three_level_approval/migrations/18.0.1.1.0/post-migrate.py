@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+
+
+def migrate(cr, version):
+    """Date the orders already waiting for approval, for the approval queue."""
+    if not version:
+        return
+    cr.execute("""
+        UPDATE purchase_order
+           SET approval_queue_date = CASE
+                   WHEN state = 'approved_level1'
+                   THEN COALESCE(level1_approved_date, write_date)
+                   ELSE write_date
+               END
+         WHERE state IN ('to_approve', 'approved_level1')
+           AND approval_queue_date IS NULL
+    """)
@@ -1,2 +1,6 @@
 # -*- coding: utf-8 -*-
+from . import purchase_approval_threshold
 from . import purchase_order
+from . import res_users
+from . import res_groups
+from . import res_partner
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+from odoo import api, fields, models, tools
+
+APPROVAL_LEVELS = [
+    ('level1', 'Level 1'),
+    ('level2', 'Level 2'),
+]
+# Used for companies without any configured threshold, in company currency.
+DEFAULT_THRESHOLDS = ((20000.0, 'level2'), (5000.0, 'level1'))
+OPEN_ORDER_STATES = ('draft', 'sent')
+
+
+class PurchaseApprovalThreshold(models.Model):
+    _name = "purchase.approval.threshold"
+    _description = "Purchase Approval Threshold"
+    _order = "company_id, amount"
+
+    company_id = fields.Many2one(
+        'res.company', string="Company", required=True, index=True,
+        default=lambda self: self.env.company)
+    currency_id = fields.Many2one(
+        'res.currency', string="Currency", required=True,
+        default=lambda self: self.env.company.currency_id)
+    level = fields.Selection(
+        APPROVAL_LEVELS, string="Required Approval Level", required=True)
+    amount = fields.Monetary(
+        string="Above Amount", required=True, currency_field='currency_id',
+        help="Orders whose total exceeds this amount require this approval level.")
+
+    _sql_constraints = [
+        ('company_level_uniq', 'unique(company_id, level)',
+         "Only one threshold per approval level and company is allowed."),
+    ]
+
+    @api.model
+    @tools.ormcache('company_id', 'date')
+    def _get_thresholds(self, company_id, date):
+        """Return the ``(amount, level)`` pairs of ``company_id``, with the
+        amounts converted to the company currency at ``date``, highest
+        amount first.
+
+        Cached per company and day; the cache is cleared whenever a
+        threshold changes.
+        """
+        company = self.env['res.company'].browse(company_id)
+        thresholds = self.sudo().search([('company_id', '=', company_id)])
+        if not thresholds:
+            return DEFAULT_THRESHOLDS
+        return tuple(sorted((
+            (threshold.currency_id._convert(
+                threshold.amount, company.currency_id, company, date),
+             threshold.level)
+            for threshold in thresholds
+        ), reverse=True))
+
+    @api.model
+    def _get_required_level(self, company_id, amount, date):
+        """Return the approval level required for ``amount``, expressed in
+        the currency of ``company_id``."""
+        for threshold, level in self._get_thresholds(company_id, date):
+            if amount > threshold:
+                return level
+        return 'auto'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        company_ids = {
+            vals.get('company_id') or self.env.company.id for vals in vals_list}
+        previous = self._snapshot_thresholds(company_ids)
+        records = super().create(vals_list)
+        self._thresholds_changed(previous)
+        return records
+
+    def write(self, vals):
+        company_ids = set(self.company_id.ids)
+        if vals.get('company_id'):
+            company_ids.add(vals['company_id'])
+        previous = self._snapshot_thresholds(company_ids)
+        res = super().write(vals)
+        self._thresholds_changed(previous)
+        return res
+
+    def unlink(self):
+        previous = self._snapshot_thresholds(self.company_id.ids)
+        res = super().unlink()
+        self._thresholds_changed(previous)
+        return res
+
+    @api.model
+    def _snapshot_thresholds(self, company_ids):
+        today = fields.Date.context_today(self)
+        return {
+            company_id: self._get_thresholds(company_id, today)
+            for company_id in company_ids
+        }
+
+    @api.model
+    def _thresholds_changed(self, previous):
+        """Recompute the required level of the open orders whose total lies
+        in the band of amounts where the thresholds of a company moved.
+
+        The band starts at the lowest moved threshold and ends at the first
+        unchanged threshold above the highest one, if any: orders outside
+        of it keep the same level.
+        """
+        self.env.registry.clear_cache()
+        current = self._snapshot_thresholds(previous)
+        field = self.env['purchase.order']._fields['approval_required_level']
+        for company_id, thresholds in previous.items():
+            moved = set(thresholds).symmetric_difference(current[company_id])
+            if not moved:
+                continue
+            low = min(amount for amount, _level in moved)
+            high = max(amount for amount, _level in moved)
+            domain = [
+                ('company_id', '=', company_id),
+                ('state', 'in', OPEN_ORDER_STATES),
+                ('amount_total_cc', '>', low),
+            ]
+            above = [
+                amount for amount, _level in current[company_id] if amount > high]
+            if above:
+                domain.append(('amount_total_cc', '<=', min(above)))
+            orders = self.env['purchase.order'].sudo().search(domain)
+            self.env.add_to_compute(field, orders)
@@ -1,10 +1,17 @@
 # -*- coding: utf-8 -*-
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import UserError
+from odoo.addons.call_profiler import profiled
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Order state -> approval level the order is waiting for.
+APPROVAL_QUEUES = {
+    'to_approve': 'level1',
+    'approved_level1': 'level2',
+}
+
 
 class PurchaseOrder(models.Model):
     _inherit = "purchase.order"
@@ -33,24 +40,78 @@ class PurchaseOrder(models.Model):
     level2_approved_date = fields.Datetime(string="L2 Approved Date")
     rejected_uid = fields.Many2one(
         'res.users', string="Rejected By")
+    approval_queue_date = fields.Datetime(
+        string="Waiting for Approval Since", copy=False, readonly=True,
+        help="When the order entered its current approval queue.")
 
-    @api.depends('amount_total')
+    @api.depends('amount_total_cc', 'company_id')
     def _compute_approval_level(self):
+        Threshold = self.env['purchase.approval.threshold']
+        today = fields.Date.context_today(self)
         for order in self:
-            amount = order.amount_total
-            if amount <= 5000:
-                order.approval_required_level = 'auto'
-            elif 5000 < amount <= 20000:
-                order.approval_required_level = 'level1'
-            else:
-                order.approval_required_level = 'level2'
+            order.approval_required_level = Threshold._get_required_level(
+                order.company_id.id, order.amount_total_cc, today)
+
+    def init(self):
+        # Lets threshold changes find the open orders of an amount band.
+        tools.create_index(
+            self.env.cr, 'purchase_order_open_amount_cc_index', self._table,
+            ['company_id', 'amount_total_cc'], where="state IN ('draft', 'sent')")
+        # Keeps the approval queue statistics independent of the history size.
+        tools.create_index(
+            self.env.cr, 'purchase_order_approval_queue_index', self._table,
+            ['state', 'approval_required_level', 'company_id'],
+            where="state IN ('to_approve', 'approved_level1')")
+
+    @api.model
+    def get_approval_queue_stats(self):
+        """Return, for each approval level of the current company, the
+        number and total amount of the orders waiting for it, and how long
+        the oldest one has been waiting.
+
+        Computed by a single grouped read, so it does not load the orders.
+        """
+        company = self.env.company
+        now = fields.Datetime.now()
+        queues = {
+            level: {
+                'level': level,
+                'count': 0,
+                'amount': 0.0,
+                'oldest_date': False,
+                'oldest_wait_hours': 0.0,
+            }
+            for level in APPROVAL_QUEUES.values()
+        }
+        groups = self._read_group(
+            [('state', 'in', list(APPROVAL_QUEUES)), ('company_id', '=', company.id)],
+            groupby=['state'],
+            aggregates=['__count', 'amount_total_cc:sum', 'approval_queue_date:min'],
+        )
+        for state, count, amount, oldest_date in groups:
+            queue = queues[APPROVAL_QUEUES[state]]
+            queue.update(count=count, amount=company.currency_id.round(amount or 0.0))
+            if oldest_date:
+                queue.update(
+                    oldest_date=fields.Datetime.to_string(oldest_date),
+                    oldest_wait_hours=round((now - oldest_date).total_seconds() / 3600, 1),
+                )
+        return {
+            'company': company.name,
+            'currency': company.currency_id.name,
+            'queues': list(queues.values()),
+        }
 
     def _send_approval_notification(self, level):
-        self.ensure_one()
-        local_context = self.env.context.copy()
-        local_context['level'] = level.replace('level', 'Level ')
-        template = self.env.ref(
-            "po_three_level_approval.email_template_approve_purchase_order", raise_if_not_found=False)
+        """Notify the approvers of ``level`` that the orders wait for them.
+
+        Mails are only queued: they are sent by the mail queue cron, so the
+        calling action does not wait for the SMTP server. A single order
+        uses the approval template; several orders are coalesced into one
+        digest mail per approver.
+        """
+        if not self:
+            return
         level_groups = {
             'level1': 'po_three_level_approval.group_po_approve_level1',
             'level2': 'po_three_level_approval.group_po_approve_level2',
@@ -59,89 +120,146 @@ class PurchaseOrder(models.Model):
         if not group_xmlid:
             _logger.warning("Invalid approval level: %s", level)
             return
+        level_label = level.replace('level', 'Level ')
+        for company, orders in self.grouped('company_id').items():
+            recipients = self._get_approver_recipients(group_xmlid, company.id)
+            if not recipients:
+                _logger.warning(
+                    "No approver email addresses found for group %s in company %s",
+                    group_xmlid, company.name)
+                continue
+            orders._queue_approval_notification(recipients, level_label)
+
+    @api.model
+    @tools.ormcache('group_xmlid', 'company_id')
+    def _get_approver_recipients(self, group_xmlid, company_id):
+        """Return the ``(email, email_formatted)`` pairs of the users of the
+        approval group who can access ``company_id``.
+
+        Cached per group and company; the cache is cleared when group
+        membership, user companies or user emails change.
+        """
         group = self.env.ref(group_xmlid, raise_if_not_found=False)
-        if not group or not group.users:
-            _logger.warning("No users found for group: %s", group_xmlid)
-            return
-        email_list = [user.email for user in group.users if user.email]
-        if not email_list:
-            _logger.warning(
-                "No email addresses found for group: %s", group.name)
-            return
+        if not group:
+            return ()
+        approvers = group.sudo().users.filtered(
+            lambda user: user.email and company_id in user.company_ids.ids)
+        return tuple((user.email, user.email_formatted) for user in approvers)
+
+    def _queue_approval_notification(self, recipients, level_label):
         try:
-            body = _(
-                "Purchase Order %s is submitted for %s approval.",
-                self._get_html_link(title=self.name),
-                level.replace('level', 'Level '),
-            )
-            self.message_post(body=body)
+            self._message_log_batch(bodies={
+                order.id: _(
+                    "Purchase Order %s is submitted for %s approval.",
+                    order._get_html_link(title=order.name),
+                    level_label,
+                )
+                for order in self
+            })
 
-            template.with_context(local_context).send_mail(
-                self.id,
-                force_send=True,
-                email_values={'email_to': ','.join(email_list)}
-            )
+            if len(self) == 1:
+                template = self.env.ref(
+                    "po_three_level_approval.email_template_approve_purchase_order")
+                template.with_context(level=level_label).send_mail(
+                    self.id,
+                    force_send=False,
+                    email_values={'email_to': ','.join(email for email, _formatted in recipients)}
+                )
+            else:
+                self._queue_approval_digest(recipients, level_label)
+            self.env.ref('mail.ir_cron_mail_scheduler_action')._trigger()
             _logger.info(
-                "Approval notification for PO %s sent to group %s (%s)",
-                self.name, group.name, ', '.join(email_list)
+                "Approval notification for PO %s queued for %s",
+                ', '.join(self.mapped('name')), ', '.join(email for email, _formatted in recipients)
             )
         except Exception as e:
             _logger.error(
-                "Failed to send approval notification for PO %s: %s", self.name, e)
+                "Failed to queue approval notification for PO %s: %s", ', '.join(self.mapped('name')), e)
 
+    def _queue_approval_digest(self, recipients, level_label):
+        """Queue one mail per recipient listing all the orders in ``self``."""
+        body = self.env['ir.qweb']._render(
+            'po_three_level_approval.approval_digest_body',
+            {'orders': self, 'level': level_label},
+        )
+        company = self.company_id[:1] or self.env.company
+        self.env['mail.mail'].sudo().create([{
+            'subject': _("%s Purchase Orders Submitted for Approval", len(self)),
+            'body_html': body,
+            'email_from': company.email_formatted or self.env.user.email_formatted,
+            'email_to': email_formatted,
+            'auto_delete': True,
+        } for _email, email_formatted in recipients])
+
+    @profiled()
     def button_confirm(self):
         """Override confirm func for 3 level approval"""
-        for order in self:
-            order._compute_approval_level()
-            if order.approval_required_level == 'auto':
-                return super(PurchaseOrder, order).button_confirm()
-            elif order.approval_required_level == 'level1' or order.approval_required_level == 'level2':
-                order.state = 'to_approve'
-                order._send_approval_notification('level1')
+        self._compute_approval_level()
+        auto_orders = self.filtered(
+            lambda o: o.approval_required_level == 'auto')
+        approval_orders = self.filtered(
+            lambda o: o.approval_required_level in ('level1', 'level2'))
+        if approval_orders:
+            approval_orders.write({
+                'state': 'to_approve',
+                'approval_queue_date': fields.Datetime.now(),
+            })
+            approval_orders._send_approval_notification('level1')
+        if auto_orders:
+            return super(PurchaseOrder, auto_orders).button_confirm()
         return True
 
     def action_approve_level1(self):
         if not self.env.user.has_group('po_three_level_approval.group_po_approve_level1'):
             raise UserError(
                 _("You don't have access to Level 1 approval."))
-        now = fields.Datetime.now()
-        for rec in self:
-            rec.level1_approved_user_id = self.env.uid
-            rec.level1_approved_date = now
-            if rec.approval_required_level == 'level1':
-                rec.button_approve()
-                body = _(
+        self.write({
+            'level1_approved_user_id': self.env.uid,
+            'level1_approved_date': fields.Datetime.now(),
+        })
+        confirmed = self.filtered(
+            lambda rec: rec.approval_required_level == 'level1')
+        escalated = self - confirmed
+        if confirmed:
+            confirmed.button_approve()
+            confirmed._message_log_batch(bodies={
+                rec.id: _(
                     "Purchase Order %s approved and confirmed by Level 1 approver.",
-                    self._get_html_link(title=self.name),
+                    rec._get_html_link(title=rec.name),
                 )
-                rec.message_post(
-                    body=body)
-            else:
-                rec.state = 'approved_level1'
-                rec._send_approval_notification('level2')
-                body = _(
+                for rec in confirmed
+            })
+        if escalated:
+            escalated.write({
+                'state': 'approved_level1',
+                'approval_queue_date': fields.Datetime.now(),
+            })
+            escalated._send_approval_notification('level2')
+            escalated._message_log_batch(bodies={
+                rec.id: _(
                     "Purchase Order %s approved at Level 1. Waiting for Level 2 approval.",
-                    self._get_html_link(title=self.name),
+                    rec._get_html_link(title=rec.name),
                 )
-                rec.message_post(
-                    body=body)
+                for rec in escalated
+            })
         return True
 
     def action_approve_level2(self):
         if not self.env.user.has_group('po_three_level_approval.group_po_approve_level2'):
             raise UserError(
                 _("You don't have access to Level 2 approval."))
-        now = fields.Datetime.now()
-        for rec in self:
-            rec.level2_approved_user_id = self.env.uid
-            rec.level2_approved_date = now
-            rec.button_approve()
-            body = _(
+        self.write({
+            'level2_approved_user_id': self.env.uid,
+            'level2_approved_date': fields.Datetime.now(),
+        })
+        self.button_approve()
+        self._message_log_batch(bodies={
+            rec.id: _(
                 "Purchase Order %s approved and confirmed by Level 2 approver.",
-                self._get_html_link(title=self.name),
+                rec._get_html_link(title=rec.name),
             )
-            rec.message_post(
-                body=body)
+            for rec in self
+        })
         return True
 
     def _send_rejection_email(self, reason=None):
@@ -156,10 +274,10 @@ class PurchaseOrder(models.Model):
             return
 
         template.send_mail(
-            self.id, force_send=True, email_values={'email_to': email_to})
+            self.id, force_send=False, email_values={'email_to': email_to})
+        self.env.ref('mail.ir_cron_mail_scheduler_action')._trigger()
 
     def action_reject_approval(self):
+        self.write({'rejected_uid': self.env.uid, 'state': 'rejected'})
         for rec in self:
-            rec.rejected_uid = self.env.uid
-            rec.state = 'rejected'
             rec._send_rejection_email()
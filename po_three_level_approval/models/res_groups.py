@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+from odoo import models
+
+
+class ResGroups(models.Model):
+    _inherit = "res.groups"
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'users' in vals:
+            self.env.registry.clear_cache()
+        return res
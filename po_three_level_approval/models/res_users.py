@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from odoo import api, models
+
+
+class ResUsers(models.Model):
+    _inherit = "res.users"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        users = super().create(vals_list)
+        # new users may belong to an approval group
+        self.env.registry.clear_cache()
+        return users
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {'groups_id', 'company_ids', 'email', 'active'}.intersection(vals):
+            self.env.registry.clear_cache()
+        return res
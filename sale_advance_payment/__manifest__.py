@@ -7,9 +7,10 @@
         journal entry upon confirmation. """,
     'description': "Advance Payment from Sale Order",
     'author': 'Rinoy',
-    'depends': ['base', 'sale_management', 'account', 'accountant'],
+    'depends': ['base', 'sale_management', 'account', 'accountant', 'call_profiler'],
     'data': [
         "data/account_data.xml",
+        "data/ir_cron.xml",
         "views/res_config_settings.xml",
         "views/sale_order_view.xml"
     ],
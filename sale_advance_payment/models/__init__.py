@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from . import account_move
 from . import res_company
 from . import res_config_settings
 from . import sale_order
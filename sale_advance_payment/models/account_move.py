@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from odoo import fields, models
+
+
+class AccountMove(models.Model):
+    _inherit = "account.move"
+
+    advance_order_id = fields.Many2one(
+        "sale.order",
+        string="Advance of Order",
+        readonly=True,
+        copy=False,
+        index='btree_not_null',
+        help="Sale order whose advance payment this entry records."
+    )
+
+    advance_consolidated_date = fields.Date(
+        string="Consolidated Advances Of",
+        readonly=True,
+        copy=False,
+        index='btree_not_null',
+        help="Day whose advance payments this consolidated entry records."
+    )
+
+    _sql_constraints = [
+        ('advance_order_uniq', 'unique(advance_order_id)',
+         "An advance payment entry already exists for this sale order."),
+    ]
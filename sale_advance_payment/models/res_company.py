@@ -11,3 +11,16 @@ class ResCompany(models.Model):
         check_company=True,
         help="Account to record customer advance payment."
     )
+
+    advance_entry_mode = fields.Selection(
+        [
+            ('per_order', 'One entry per order'),
+            ('daily', 'One consolidated entry per day'),
+        ],
+        string="Advance Entry Mode",
+        default='per_order',
+        required=True,
+        help="Post one journal entry per confirmed order, or accumulate the "
+             "advances of the day and post them as a single entry with one "
+             "line per customer."
+    )
@@ -12,3 +12,8 @@ class ResConfigSettings(models.TransientModel):
         readonly=False,
         help="Account to record customer advance payment."
     )
+
+    advance_entry_mode = fields.Selection(
+        related="company_id.advance_entry_mode",
+        readonly=False,
+    )
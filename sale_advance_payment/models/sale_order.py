@@ -1,6 +1,11 @@
 # -*- coding: utf-8 -*-
-from odoo import fields, models, _
+import logging
+from odoo import api, fields, models, _
 from odoo.exceptions import UserError
+from odoo.tools import SQL
+from odoo.addons.call_profiler import profiled
+
+_logger = logging.getLogger(__name__)
 
 
 class SaleOrder(models.Model):
@@ -20,29 +25,107 @@ class SaleOrder(models.Model):
         help="journal entry created for advance payment."
     )
 
+    advance_move_line_id = fields.Many2one(
+        "account.move.line",
+        string="Adv. Journal Item",
+        readonly=True,
+        copy=False,
+        help="Receivable journal item carrying the advance payment. With "
+             "daily consolidation it is shared by the orders of the customer "
+             "on that day."
+    )
+
+    advance_pending_date = fields.Date(
+        string="Advance Pending Since",
+        readonly=True,
+        copy=False,
+        index='btree_not_null',
+        help="Day of the advance payment, while it waits for the daily "
+             "consolidated journal entry."
+    )
+
     def _create_advance_payment_entry(self):
         self.ensure_one()
         if self.advance_entry_id:
             return True
-        partner = self.partner_id
-        amount = self.advance_payment
-        company = self.company_id
+        return self._create_advance_payment_entries()
 
-        receivable_account = partner.property_account_receivable_id
-        if not receivable_account:
-            raise UserError(
-                _("No receivable account is set for customer %s.") % self.partner_id.name)
+    @profiled()
+    def _create_advance_payment_entries(self):
+        """Create and post the advance payment entries of the orders in
+        ``self`` that do not have one yet.
 
-        advance_account = company.advance_account_id
-        if not advance_account:
-            raise UserError(
-                _("Please configure an Advance Received account in accounting settings."))
+        All the entries are created by a single ``create`` and posted by a
+        single ``action_post``, so confirming many orders at once does not
+        cost a round of queries per order.
+        """
+        orders = self.filtered(
+            lambda order: not order.advance_entry_id)._claim_advance_orders()
+        if not orders:
+            return self.env['account.move']
 
-        journal = self.env.ref('sale_advance_payment.journal_advance_payment')
+        journal = self.env.ref(
+            'sale_advance_payment.journal_advance_payment', raise_if_not_found=False)
         if not journal:
             raise UserError(
                 _("No journal found for advance payment entries."))
 
+        date = fields.Date.context_today(self)
+        move_vals_list = []
+        move_order_ids = []
+        for company, company_orders in orders.grouped('company_id').items():
+            advance_account = company.advance_account_id
+            if not advance_account:
+                raise UserError(
+                    _("Please configure an Advance Received account in accounting settings."))
+            for order in company_orders:
+                receivable_account = order.partner_id.with_company(
+                    company).property_account_receivable_id
+                if not receivable_account:
+                    raise UserError(
+                        _("No receivable account is set for customer %s.") % order.partner_id.name)
+                move_vals_list.append(order._prepare_advance_move_vals(
+                    journal, receivable_account, advance_account, date))
+                move_order_ids.append(order.id)
+
+        move_orders = self.browse(move_order_ids)
+        moves = self.env['account.move'].create(move_vals_list)
+        moves.action_post()
+
+        # Different values per order, but the ORM flushes them in one UPDATE.
+        for order, move in zip(move_orders, moves):
+            order.advance_entry_id = move
+            order.advance_move_line_id = move.line_ids.filtered('debit')[:1]
+        move_orders._message_log_batch(bodies={
+            order.id: _("Journal Entry: %s", move._get_html_link(title=move.name))
+            for order, move in zip(move_orders, moves)
+        })
+        return moves
+
+    def _claim_advance_orders(self, skip_locked=False):
+        """Lock and return the orders that still have no advance entry."""
+        if not self:
+            return self
+        self.flush_recordset(['advance_entry_id'])
+        rows = self.env.execute_query(SQL("""
+            SELECT id
+              FROM sale_order
+             WHERE id IN %s
+               AND advance_entry_id IS NULL
+          ORDER BY id
+               FOR NO KEY UPDATE %s
+        """, tuple(self.ids), SQL("SKIP LOCKED") if skip_locked else SQL()))
+        claimed = self.browse([order_id for [order_id] in rows])
+        if skip_locked and len(claimed) < len(self):
+            _logger.info(
+                "Skipped advance entries of orders %s, locked by another transaction",
+                (self - claimed).ids)
+        return claimed
+
+    def _prepare_advance_move_vals(self, journal, receivable_account, advance_account, date):
+        self.ensure_one()
+        partner = self.partner_id
+        amount = self.advance_payment
         move_lines = [
             (0, 0, {
                 'name': f"Advance Payment - {self.name}",
@@ -59,35 +142,125 @@ class SaleOrder(models.Model):
                 'debit': 0.0,
             }),
         ]
-        move_vals = {
+        return {
             'ref': f"Advance for {self.name}",
             'move_type': 'entry',
-            'date': fields.Date.context_today(self),
+            'date': date,
             'journal_id': journal.id,
-            'company_id': company.id,
+            'company_id': self.company_id.id,
             'partner_id': partner.id,
+            'advance_order_id': self.id,
             'line_ids': move_lines,
         }
 
-        move = self.env['account.move'].create(move_vals)
-        move.action_post()
+    def action_confirm(self):
+        res = super().action_confirm()
+        advance_orders = self.filtered(lambda order: order.advance_payment > 0)
+        daily_orders = advance_orders.filtered(
+            lambda order: order.company_id.advance_entry_mode == 'daily'
+            and not order.advance_entry_id)
+        if daily_orders:
+            daily_orders.advance_pending_date = fields.Date.context_today(self)
+        (advance_orders - daily_orders)._create_advance_payment_entries()
+        return res
 
-        self.advance_entry_id = move.id
+    @api.model
+    def _cron_post_consolidated_advances(self):
+        """Post the consolidated advance entry of every past day that still
+        has pending advances, one entry per company and day."""
+        today = fields.Date.context_today(self)
+        orders = self.search([
+            ('advance_pending_date', '<', today),
+            ('advance_entry_id', '=', False),
+            ('state', '=', 'sale'),
+        ], order='advance_pending_date, id')
+        journal = self.env.ref(
+            'sale_advance_payment.journal_advance_payment', raise_if_not_found=False)
+        if not orders or not journal:
+            return
+        day_groups = orders.grouped(
+            lambda order: (order.company_id, order.advance_pending_date))
+        for (company, date), day_orders in day_groups.items():
+            if not company.advance_account_id:
+                _logger.warning(
+                    "No Advance Received account configured for company %s, "
+                    "skipping its advances of %s", company.name, date)
+                continue
+            try:
+                with self.env.cr.savepoint():
+                    day_orders = day_orders._claim_advance_orders(skip_locked=True)
+                    if day_orders:
+                        day_orders._post_consolidated_advance_entry(journal, date)
+            except Exception:
+                _logger.exception(
+                    "Could not post the advances of %s for company %s", date, company.name)
+                self.env.invalidate_all()
+                continue
+            self.env.cr.commit()  # pylint: disable=invalid-commit
 
-        body = _(
-            "Journal Entry: %s", move._get_html_link(title=move.name)
-        )
-        self.message_post(body=body)
+    def _post_consolidated_advance_entry(self, journal, date):
+        """Post one entry for the advances of ``self``, which all belong to
+        the same company and day, with one receivable and one advance line
+        per customer, and link every order to its customer's line."""
+        company = self.company_id.ensure_one()
+        advance_account = company.advance_account_id
+        by_partner = self.grouped('partner_id')
+        line_vals = []
+        for partner, orders in by_partner.items():
+            receivable_account = partner.with_company(company).property_account_receivable_id
+            if not receivable_account:
+                raise UserError(
+                    _("No receivable account is set for customer %s.") % partner.name)
+            amount = sum(orders.mapped('advance_payment'))
+            name = _("Advance Payments - %(date)s (%(count)s orders)",
+                     date=date, count=len(orders))
+            line_vals += [
+                (0, 0, {
+                    'name': name,
+                    'partner_id': partner.id,
+                    'account_id': receivable_account.id,
+                    'debit': amount,
+                    'credit': 0.0,
+                }),
+                (0, 0, {
+                    'name': name,
+                    'partner_id': partner.id,
+                    'account_id': advance_account.id,
+                    'credit': amount,
+                    'debit': 0.0,
+                }),
+            ]
+        # Orders skipped by an earlier run (locked at the time) get an entry
+        # of their own: the day's posted entry may already be reconciled.
+        supplementary = self.env['account.move'].search_count([
+            ('company_id', '=', company.id),
+            ('advance_consolidated_date', '=', date),
+        ], limit=1)
+        move = self.env['account.move'].create({
+            'ref': _("Supplementary advances of %s", date) if supplementary
+            else _("Advances of %s", date),
+            'move_type': 'entry',
+            'date': date,
+            'journal_id': journal.id,
+            'company_id': company.id,
+            'advance_consolidated_date': date,
+            'line_ids': line_vals,
+        })
+        move.action_post()
 
+        receivable_lines = move.line_ids.filtered('debit').grouped('partner_id')
+        for partner, orders in by_partner.items():
+            orders.write({
+                'advance_entry_id': move.id,
+                'advance_move_line_id': receivable_lines[partner].id,
+                'advance_pending_date': False,
+            })
+        self._message_log_batch(bodies={
+            order.id: _("Journal Entry: %s", move._get_html_link(title=move.name))
+            for order in self
+        })
         return move
 
-    def action_confirm(self):
-        res = super().action_confirm()
-        for order in self:
-            if order.advance_payment > 0:
-                order._create_advance_payment_entry()
-        return res
-
     def action_view_advance_entry(self):
         self.ensure_one()
         if not self.advance_entry_id:
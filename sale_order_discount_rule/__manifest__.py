@@ -6,9 +6,10 @@
     "summary": "Dynamic discount rules for Sales Orders",
     'description': "Dynamic discount rules for Sales Orders",
     'author': 'Rinoy',
-    'depends': ['base', 'sales_team', 'sale_management'],
+    'depends': ['base', 'sales_team', 'sale_management', 'call_profiler'],
     'data': [
         "security/ir.model.access.csv",
+        "data/ir_cron.xml",
         "views/sale_discount_rule.xml",
         "views/sale_order_views.xml"
     ],
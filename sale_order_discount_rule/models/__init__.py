@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
 from . import sale_discount_rule
+from . import sale_discount_reapply_job
 from . import sale_order
 from . import sale_order_line
+from . import sale_discount_benchmark
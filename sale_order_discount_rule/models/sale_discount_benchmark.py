@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+from odoo import api, models
+
+_logger = logging.getLogger(__name__)
+
+
+class SaleDiscountBenchmark(models.AbstractModel):
+    _name = "sale.discount.benchmark"
+    _description = "Discount Rule Engine Benchmark"
+
+    @api.model
+    def _run(self, rule_counts=(100, 1000, 10000, 100000), line_counts=(1, 10, 100, 1000),
+             order_count=100, group_count=20, seed=42, output=None):
+        """Benchmark the discount rule engine on synthetic data.
+
+        For every number of rules in ``rule_counts`` and of lines per order
+        in ``line_counts``, measure creating an order, editing one of its
+        lines, and reapplying discounts on ``order_count`` orders. All data
+        is created inside a savepoint that is rolled back afterwards, so
+        this can be run on a local test database from ``odoo-bin shell``::
+
+            env['sale.discount.benchmark']._run(output='/tmp/bench.json')
+
+        :param output: optional path of a JSON file to write the results to
+        :return: list of dicts with the scenario, its parameters, and the
+                 measured ``queries``, ``seconds`` and ``peak_memory_kb``
+        """
+        rng = random.Random(seed)
+        results = []
+        savepoint = self.env.cr.savepoint()
+        try:
+            product = self.env['product.product'].create({
+                'name': 'Discount Benchmark Product',
+                'list_price': 10.0,
+            })
+            groups = self.env['res.partner.category'].create([
+                {'name': 'Discount Benchmark Group %s' % index}
+                for index in range(group_count)
+            ])
+            partner = self.env['res.partner'].create({
+                'name': 'Discount Benchmark Customer',
+                'category_id': [(6, 0, groups[:3].ids)],
+            })
+            created_rules = 0
+            for rule_count in sorted(rule_counts):
+                self._create_rules(rng, groups, rule_count - created_rules)
+                created_rules = rule_count
+                for line_count in line_counts:
+                    results.extend(self._run_scenarios(
+                        rng, partner, product, rule_count, line_count, order_count))
+        finally:
+            savepoint.close(rollback=True)
+            self.env.invalidate_all()
+            self.env.registry.clear_cache()
+
+        for result in results:
+            _logger.info("Discount benchmark: %s", json.dumps(result))
+        if output:
+            with open(output, 'w') as output_file:
+                json.dump(results, output_file, indent=2)
+        return results
+
+    @api.model
+    def _create_rules(self, rng, groups, count):
+        today = date.today()
+        Rule = self.env['sale.discount.rule'].with_context(
+            tracking_disable=True, mail_create_nolog=True)
+        vals_list = []
+        for index in range(count):
+            min_amount = rng.uniform(0, 100000)
+            vals_list.append({
+                'name': 'Benchmark Rule %s' % index,
+                'min_amount': min_amount,
+                'max_amount': min_amount + rng.uniform(1, 50000),
+                'discount_percent': rng.uniform(0.01, 0.5),
+                'customer_group_id': rng.choice(groups).id if rng.random() < 0.7 else False,
+                'valid_from': today - timedelta(days=rng.randint(0, 30)),
+                'valid_to': today + timedelta(days=rng.randint(0, 30)),
+            })
+            if len(vals_list) == 1000:
+                Rule.create(vals_list)
+                vals_list = []
+        if vals_list:
+            Rule.create(vals_list)
+
+    @api.model
+    def _run_scenarios(self, rng, partner, product, rule_count, line_count, order_count):
+        results = []
+        labels = {'rules': rule_count, 'lines': line_count}
+
+        def order_vals():
+            return {
+                'partner_id': partner.id,
+                'order_line': [(0, 0, {
+                    'product_id': product.id,
+                    'product_uom_qty': rng.randint(1, 20),
+                    'price_unit': rng.uniform(1, 500),
+                }) for _i in range(line_count)],
+            }
+
+        SaleOrder = self.env['sale.order']
+        vals = order_vals()
+        order = self._measure(
+            results, lambda: SaleOrder.create(vals), scenario='create', **labels)
+
+        def edit_line():
+            order.order_line[:1].product_uom_qty += 1
+            SaleOrder._process_pending_discounts()
+        self._measure(results, edit_line, scenario='line_edit', **labels)
+
+        orders = SaleOrder.create([order_vals() for _i in range(order_count)])
+        self._measure(
+            results, lambda: orders._apply_best_discount(force=True),
+            scenario='bulk_reapply', orders=order_count, **labels)
+        return results
+
+    @api.model
+    def _measure(self, results, action, **labels):
+        """Record query count, wall time and peak Python memory of calling
+        ``action``, including the flush of its pending writes, and return
+        its result.
+
+        Tracing allocations slows Python down several times, so ``action``
+        runs twice: untraced for queries and time, then rolled back, and
+        traced for memory. Only the effects of the second run are kept; it
+        finds the ORM caches warmed by the first.
+        """
+        cr = self.env.cr
+        self.env.flush_all()
+        savepoint = cr.savepoint()
+        try:
+            queries = cr.sql_log_count
+            start = time.perf_counter()
+            action()
+            self.env.flush_all()
+            seconds = time.perf_counter() - start
+            queries = cr.sql_log_count - queries
+        finally:
+            savepoint.close(rollback=True)
+            self.env.invalidate_all()
+
+        tracemalloc.start()
+        try:
+            result = action()
+            self.env.flush_all()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        results.append(dict(
+            labels,
+            queries=queries,
+            seconds=round(seconds, 6),
+            peak_memory_kb=round(peak / 1024, 1),
+        ))
+        return result
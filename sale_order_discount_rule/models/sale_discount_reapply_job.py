@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+from odoo import api, fields, models, _
+
+_logger = logging.getLogger(__name__)
+
+
+class SaleDiscountReapplyJob(models.Model):
+    _name = "sale.discount.reapply.job"
+    _description = "Discount Rule Reapply Job"
+    _order = "id desc"
+
+    rule_id = fields.Many2one(
+        "sale.discount.rule", string="Discount Rule", required=True,
+        ondelete="cascade", readonly=True)
+    state = fields.Selection([
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string="Status", default='queued', required=True, readonly=True)
+    last_order_id = fields.Integer(
+        "Last Processed Order", readonly=True,
+        help="Orders are processed by increasing id; an interrupted job "
+             "resumes after this one.")
+    processed_count = fields.Integer("Processed Orders", readonly=True)
+    error_message = fields.Text("Error", readonly=True)
+    duration = fields.Float("Duration (s)", readonly=True)
+    throughput = fields.Float(
+        "Orders per Second", compute="_compute_throughput")
+
+    @api.depends('processed_count', 'duration')
+    def _compute_throughput(self):
+        for job in self:
+            job.throughput = job.processed_count / job.duration if job.duration else 0.0
+
+    @api.model
+    def _cron_process_jobs(self):
+        for job in self.search([('state', 'in', ('queued', 'running'))], order='id'):
+            job._process()
+
+    def _process(self):
+        """Re-price the quotations affected by the rule, one chunk per
+        transaction, starting after the last order already processed."""
+        self.ensure_one()
+        chunk_size = int(self.env['ir.config_parameter'].sudo().get_param(
+            'sale_order_discount_rule.reapply_chunk_size', 500))
+        self.state = 'running'
+        self.env.cr.commit()  # pylint: disable=invalid-commit
+
+        try:
+            domain = self.rule_id._get_affected_orders_domain()
+            SaleOrder = self.env['sale.order']
+            while True:
+                orders = SaleOrder.search(
+                    domain + [('id', '>', self.last_order_id)], order='id', limit=max(chunk_size, 1))
+                if not orders:
+                    break
+                start = time.perf_counter()
+                orders._apply_best_discount(force=True)
+                self.write({
+                    'last_order_id': orders[-1].id,
+                    'processed_count': self.processed_count + len(orders),
+                    'duration': self.duration + time.perf_counter() - start,
+                })
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+                _logger.info(
+                    "Discount rule %s: %s quotations re-priced (%.1f orders/s)",
+                    self.rule_id.id, self.processed_count, self.throughput)
+                self.env.invalidate_all()
+        except Exception as e:
+            # Failed jobs are no longer picked up, so a chunk that keeps
+            # failing does not block the jobs queued after it on every run.
+            self.env.cr.rollback()
+            _logger.exception("Discount reapply job %s failed", self.id)
+            self.write({'state': 'failed', 'error_message': str(e)})
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+            return
+
+        self.state = 'done'
+        self.rule_id.message_post(body=_(
+            "Discount reapplied to %(count)s quotations in %(duration).1f seconds "
+            "(%(throughput).1f orders per second).",
+            count=self.processed_count, duration=self.duration,
+            throughput=self.throughput))
+        self.env.cr.commit()  # pylint: disable=invalid-commit
@@ -1,5 +1,11 @@
-from odoo import models, fields, api, _
+import heapq
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import date
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import ValidationError, UserError
+from odoo.osv import expression
+from odoo.tools import SQL
 
 
 class SaleDiscountRule(models.Model):
@@ -20,30 +26,65 @@ class SaleDiscountRule(models.Model):
     valid_from = fields.Date("Valid From", required=True, tracking=True)
     valid_to = fields.Date("Valid To", required=True, tracking=True)
 
+    def init(self):
+        # Lookups only need the active rules valid on a given day; the range
+        # expressions let PostgreSQL find them with a GiST containment or
+        # overlap search instead of scanning the whole (seasonal) rule set.
+        # The predicate skips rows with inverted bounds: building their range
+        # would fail in PostgreSQL before the constraints below can report it.
+        tools.create_index(
+            self.env.cr,
+            "sale_discount_rule_validity_amount_gist",
+            self._table,
+            [
+                "daterange(valid_from, valid_to, '[]')",
+                "numrange(min_amount::numeric, max_amount::numeric, '[]')",
+            ],
+            method="gist",
+            where="active AND valid_from <= valid_to AND min_amount <= max_amount",
+        )
+
     @api.constrains("min_amount", "max_amount")
     def _check_amount_range(self):
-        for rec in self:
-            if rec.max_amount < rec.min_amount:
-                raise ValidationError(
-                    _("Maximum amount must be greater than or equal to minimum amount."))
-            if rec.max_amount <= 0:
-                raise ValidationError(
-                    _("Maximum amount must be greater than 0.")
-                )
+        invalid = self.filtered(lambda rec: rec.max_amount < rec.min_amount)
+        if invalid:
+            raise ValidationError(
+                _("Maximum amount must be greater than or equal to minimum amount.\n%s",
+                  ", ".join(invalid.mapped("name"))))
+        invalid = self.filtered(lambda rec: rec.max_amount <= 0)
+        if invalid:
+            raise ValidationError(
+                _("Maximum amount must be greater than 0.\n%s",
+                  ", ".join(invalid.mapped("name"))))
 
     @api.constrains("valid_from", "valid_to")
     def _check_validity_dates(self):
-        for rec in self:
-            if rec.valid_from and rec.valid_to and rec.valid_from > rec.valid_to:
-                raise ValidationError(
-                    _("Valid To must be greater than or equal to Valid From."))
+        invalid = self.filtered(
+            lambda rec: rec.valid_from and rec.valid_to and rec.valid_from > rec.valid_to)
+        if invalid:
+            raise ValidationError(
+                _("Valid To must be greater than or equal to Valid From.\n%s",
+                  ", ".join(invalid.mapped("name"))))
 
     @api.constrains("discount_percent")
     def _check_discount_percent(self):
-        for rec in self:
-            if rec.discount_percent <= 0 or rec.discount_percent > 1:
-                raise ValidationError(
-                    _("Discount must be greater than 0 and less than or equal to 100."))
+        invalid = self.filtered(
+            lambda rec: rec.discount_percent <= 0 or rec.discount_percent > 1)
+        if invalid:
+            raise ValidationError(
+                _("Discount must be greater than 0 and less than or equal to 100.\n%s",
+                  ", ".join(invalid.mapped("name"))))
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        rules = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return rules
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
 
     def unlink(self):
         used_orders = self.env["sale.order"].search(
@@ -51,4 +92,149 @@ class SaleDiscountRule(models.Model):
         if used_orders:
             raise UserError(
                 _("You cannot delete a discount rule that is used in a Sale Order."))
-        return super().unlink()
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    def action_reapply_to_quotations(self):
+        """Queue the re-pricing of the quotations affected by the rules."""
+        self.env["sale.discount.reapply.job"].create(
+            [{"rule_id": rule.id} for rule in self])
+        self.env.ref(
+            "sale_order_discount_rule.ir_cron_process_reapply_jobs")._trigger()
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "type": "info",
+                "message": _("Quotations will be re-priced in the background."),
+                "next": {"type": "ir.actions.act_window_close"},
+            },
+        }
+
+    def _get_affected_orders_domain(self):
+        """Return the domain of the quotations whose discount may change
+        because of this rule: those it is applied to, and those it may now
+        apply to.
+
+        The undiscounted total is not stored, but it is at least the
+        untaxed amount, so quotations above ``max_amount`` can be excluded.
+        """
+        self.ensure_one()
+        affected = [("applied_discount_rule_id", "=", self.id)]
+        today = date.today()
+        if self.active and self.valid_from <= today <= self.valid_to:
+            eligible = [("amount_untaxed", "<=", self.max_amount)]
+            if self.customer_group_id:
+                eligible.append(
+                    ("partner_id.category_id", "in", self.customer_group_id.ids))
+            affected = expression.OR([affected, eligible])
+        return expression.AND([[("state", "in", ("draft", "sent"))], affected])
+
+    @api.model
+    def _find_best_rule(self, amount, customer_group_ids, today=None):
+        """Return the rule with the highest discount that applies to an order
+        of ``amount`` for a customer in ``customer_group_ids``.
+
+        Rules without a customer group apply to every customer. The lookup
+        is a binary search in :meth:`_get_rule_index`, so it does not query
+        the database once the index for ``today`` is cached.
+        """
+        return self._find_best_rule_bracket(amount, customer_group_ids, today=today)[0]
+
+    @api.model
+    def _find_best_rule_bracket(self, amount, customer_group_ids, today=None):
+        """Same as :meth:`_find_best_rule`, also returning the bracket of
+        amounts around ``amount`` for which the result stays the same.
+
+        :return: tuple ``(rule, low, high)``; when ``low == high`` the bracket
+                 is that single amount, otherwise it is the open interval
+                 ``(low, high)`` where ``None`` means unbounded
+        """
+        _token, index = self._get_rule_index(today or date.today())
+        best = None
+        low = high = None
+        for group_id in list(customer_group_ids) + [False]:
+            if group_id not in index:
+                continue
+            bounds, slots = index[group_id]
+            position = bisect_left(bounds, amount)
+            if position < len(bounds) and bounds[position] == amount:
+                candidate = slots[2 * position + 1]
+                low = high = amount
+            else:
+                candidate = slots[2 * position]
+                if low != high or low is None:
+                    if position > 0 and (low is None or bounds[position - 1] > low):
+                        low = bounds[position - 1]
+                    if position < len(bounds) and (high is None or bounds[position] < high):
+                        high = bounds[position]
+            if candidate and (best is None or candidate < best):
+                best = candidate
+        rule = self.browse(best[1]) if best else self.browse()
+        return rule, low, high
+
+    @api.model
+    def _get_rule_index_token(self, today=None):
+        """Return a token identifying the rule set indexed for ``today``; it
+        changes whenever a rule valid on that day is added, changed or
+        removed."""
+        return self._get_rule_index(today or date.today())[0]
+
+    @api.model
+    @tools.ormcache('today')
+    def _get_rule_index(self, today):
+        """Build the lookup index of the rules valid on ``today``.
+
+        Rules are bucketed by customer group. In each bucket the sorted
+        ``min_amount``/``max_amount`` bounds split the amount axis into
+        slots: slot ``2k + 1`` is exactly ``bounds[k]`` and slot ``2k`` is
+        the open interval below it. Each slot holds the best rule covering
+        it as a ``(-discount_percent, rule_id)`` tuple, or ``None``.
+
+        :return: tuple ``(token, index)`` where ``index`` is a dict of
+                 customer group id (``False`` for rules without a group)
+                 -> ``(bounds, slots)``
+        """
+        self.flush_model(["active", "valid_from", "valid_to", "min_amount", "max_amount"])
+        rule_ids = [rule_id for [rule_id] in self.env.execute_query(SQL("""
+            SELECT id
+              FROM sale_discount_rule
+             WHERE active
+               AND valid_from <= valid_to
+               AND min_amount <= max_amount
+               AND daterange(valid_from, valid_to, '[]') @> %s::date
+        """, today))]
+        rules = self.sudo().browse(rule_ids)
+        rules.fetch(["min_amount", "max_amount", "discount_percent", "customer_group_id", "write_date"])
+        buckets = defaultdict(list)
+        for rule in rules:
+            buckets[rule.customer_group_id.id].append(rule)
+        last_write = max(rules.mapped('write_date'), default=False)
+        token = "%s|%s|%s" % (today, last_write, len(rules))
+        return token, {
+            group_id: self._build_interval_index(group_rules)
+            for group_id, group_rules in buckets.items()
+        }
+
+    @api.model
+    def _build_interval_index(self, rules):
+        bounds = sorted({rule.min_amount for rule in rules} | {rule.max_amount for rule in rules})
+        position = {bound: index for index, bound in enumerate(bounds)}
+        starts = defaultdict(list)
+        for rule in rules:
+            first_slot = 2 * position[rule.min_amount] + 1
+            last_slot = 2 * position[rule.max_amount] + 1
+            starts[first_slot].append((-rule.discount_percent, rule.id, last_slot))
+
+        # Sweep the slots keeping the applicable rules in a heap ordered by
+        # best discount, dropping rules whose last slot has been passed.
+        slots = []
+        active = []
+        for slot in range(2 * len(bounds) + 1):
+            for entry in starts.get(slot, ()):
+                heapq.heappush(active, entry)
+            while active and active[0][2] < slot:
+                heapq.heappop(active)
+            slots.append(active[0][:2] if active else None)
+        return tuple(bounds), tuple(slots)
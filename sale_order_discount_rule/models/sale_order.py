@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
-from odoo import api, fields, models
+from collections import defaultdict
 from datetime import date
+from odoo import api, fields, models
+from odoo.tools import SQL, float_compare
+from odoo.addons.call_profiler import profiled
 
 
 class SaleOrder(models.Model):
@@ -10,6 +13,9 @@ class SaleOrder(models.Model):
         "sale.discount.rule", string="Discount Rule", readonly=True, ondelete="restrict",
     )
     discount_percent = fields.Float("Discount (%)", readonly=True)
+    discount_bracket = fields.Json(
+        "Discount Bracket", readonly=True, copy=False,
+        help="Amounts for which the applied discount rule stays the best one.")
 
     @api.model_create_multi
     def create(self, vals_list):
@@ -17,45 +23,111 @@ class SaleOrder(models.Model):
         orders._apply_best_discount()
         return orders
 
-    def _apply_best_discount(self):
+    def write(self, vals):
+        res = super().write(vals)
+        if 'order_line' in vals:
+            # line edits made through the order form are settled right away
+            self._process_pending_discounts()
+        return res
+
+    def _schedule_discount_update(self):
+        """Queue the orders for one discount re-evaluation per transaction."""
+        pending = self.env.cr.precommit.data.setdefault(
+            'sale_order_discount_rule.pending_orders', set())
+        if not pending:
+            self.env.cr.precommit.add(self._process_pending_discounts)
+        pending.update(self.ids)
+
+    @api.model
+    def _process_pending_discounts(self):
+        pending = self.env.cr.precommit.data.pop(
+            'sale_order_discount_rule.pending_orders', None)
+        if pending:
+            self.browse(sorted(pending)).exists()._apply_best_discount()
+            self.env.flush_all()
+
+    @profiled()
+    def _apply_best_discount(self, force=False):
+        """Apply the best discount rule to the orders not still in their bracket."""
+        if not self:
+            return
         today = date.today()
+        amounts = self._get_discount_base_amounts()
+        Rule = self.env["sale.discount.rule"]
+        token = Rule._get_rule_index_token(today)
+        order_ids_by_rule = defaultdict(list)
+        order_ids_by_bracket = defaultdict(list)
+        unchanged_ids_by_percent = defaultdict(list)
         for order in self:
-            amount_total = sum(
-                line.product_uom_qty * line.price_unit for line in order.order_line if not line.display_type)
-            customer_groups = order.partner_id.category_id.ids
-
-            domain = [
-                ("min_amount", "<=", amount_total),
-                ("max_amount", ">=", amount_total),
-                ("valid_from", "<=", today),
-                ("valid_to", ">=", today)]
-
-            if customer_groups:
-                domain.append(("customer_group_id", "in",
-                              customer_groups + [False]))
-            else:
-                domain.append(("customer_group_id", "=", False))
-
-            rule = self.env["sale.discount.rule"].search(
-                domain, order="discount_percent desc", limit=1)
-
-            if rule:
-                order.applied_discount_rule_id = rule.id
-                applied_percent = (rule.discount_percent * 100)
-                order.discount_percent = applied_percent
-                order._apply_discount_to_lines(applied_percent)
-            else:
-                order.applied_discount_rule_id = False
-                order.discount_percent = 0.0
-                order._apply_discount_to_lines(0.0)
+            amount = amounts.get(order.id, 0.0)
+            customer_groups = sorted(order.partner_id.category_id.ids)
+            if not force and order._discount_bracket_contains(amount, customer_groups, token):
+                unchanged_ids_by_percent[order.discount_percent].append(order.id)
+                continue
+            rule, low, high = Rule._find_best_rule_bracket(
+                amount, customer_groups, today=today)
+            order_ids_by_rule[rule].append(order.id)
+            order_ids_by_bracket[low, high, tuple(customer_groups)].append(order.id)
+
+        for (low, high, customer_groups), order_ids in order_ids_by_bracket.items():
+            self.browse(order_ids).discount_bracket = {
+                'token': token,
+                'customer_groups': list(customer_groups),
+                'low': low,
+                'high': high,
+            }
+
+        order_ids_by_percent = defaultdict(list)
+        for rule, order_ids in order_ids_by_rule.items():
+            applied_percent = (rule.discount_percent * 100) if rule else 0.0
+            orders_to_update = self.browse(order_ids).filtered(
+                lambda o: o.applied_discount_rule_id != rule
+                or o.discount_percent != applied_percent)
+            if orders_to_update:
+                orders_to_update.write({
+                    'applied_discount_rule_id': rule.id,
+                    'discount_percent': applied_percent,
+                })
+            order_ids_by_percent[applied_percent].extend(order_ids)
+        for applied_percent, order_ids in unchanged_ids_by_percent.items():
+            order_ids_by_percent[applied_percent].extend(order_ids)
+
+        for applied_percent, order_ids in order_ids_by_percent.items():
+            self.browse(order_ids)._apply_discount_to_lines(applied_percent)
+
+    def _discount_bracket_contains(self, amount, customer_groups, token):
+        """Whether ``amount`` is still inside the stored bracket."""
+        self.ensure_one()
+        bracket = self.discount_bracket
+        if not bracket or bracket['token'] != token \
+                or bracket['customer_groups'] != customer_groups:
+            return False
+        low, high = bracket['low'], bracket['high']
+        if low is not None and low == high:
+            return amount == low
+        return (low is None or amount > low) and (high is None or amount < high)
+
+    def _get_discount_base_amounts(self):
+        """Return the undiscounted total of each order, by order id."""
+        self.env['sale.order.line'].flush_model(
+            ['order_id', 'product_uom_qty', 'price_unit', 'display_type'])
+        rows = self.env.execute_query(SQL("""
+            SELECT order_id, SUM(product_uom_qty * price_unit)::float
+              FROM sale_order_line
+             WHERE order_id IN %s
+               AND display_type IS NULL
+          GROUP BY order_id
+        """, tuple(self.ids)))
+        return dict(rows)
 
     def _apply_discount_to_lines(self, discount_percent):
-        for order in self:
-            lines_to_update = order.order_line.filtered(
-                lambda l: not l.display_type)
-            if lines_to_update:
-                lines_to_update.write({'discount': discount_percent})
+        precision = self.env['decimal.precision'].precision_get('Discount')
+        lines_to_update = self.order_line.filtered(
+            lambda l: not l.display_type and float_compare(
+                l.discount, discount_percent, precision_digits=precision))
+        if lines_to_update:
+            lines_to_update.write({'discount': discount_percent})
         return True
 
     def action_reapply_discount(self):
-        self._apply_best_discount()
+        self._apply_best_discount(force=True)
@@ -9,5 +9,5 @@ class SaleOrderLine(models.Model):
         res = super().write(vals)
         tracked_fields = {"product_id", "product_uom_qty", "price_unit"}
         if any(f in vals for f in tracked_fields):
-            self.order_id._apply_best_discount()
+            self.order_id._schedule_discount_update()
         return res
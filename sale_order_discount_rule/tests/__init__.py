@@ -0,0 +1 @@
+from . import test_discount_rule_index
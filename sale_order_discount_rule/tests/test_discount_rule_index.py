@@ -0,0 +1,78 @@
+from datetime import date, timedelta
+from odoo.tests import TransactionCase
+
+
+class TestDiscountRuleIndex(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        Category = cls.env["res.partner.category"]
+        cls.group_a = Category.create({"name": "Group A"})
+        cls.group_b = Category.create({"name": "Group B"})
+        cls.group_c = Category.create({"name": "Group C"})
+        today = date.today()
+        Rule = cls.env["sale.discount.rule"]
+        base = {"valid_from": today, "valid_to": today}
+        Rule.create([
+            dict(base, name="Base", min_amount=0, max_amount=100, discount_percent=0.05),
+            dict(base, name="A mid", min_amount=50, max_amount=150, discount_percent=0.10,
+                 customer_group_id=cls.group_a.id),
+            dict(base, name="B high", min_amount=100, max_amount=200, discount_percent=0.10,
+                 customer_group_id=cls.group_b.id),
+            dict(base, name="Exactly 100", min_amount=100, max_amount=100, discount_percent=0.20),
+            dict(base, name="Large", min_amount=150, max_amount=300, discount_percent=0.05),
+            dict(base, name="Shared tie", min_amount=120, max_amount=180, discount_percent=0.10),
+            dict(base, name="Expired", min_amount=0, max_amount=1000, discount_percent=0.90,
+                 valid_from=today - timedelta(days=10), valid_to=today - timedelta(days=1)),
+            dict(base, name="Archived", min_amount=0, max_amount=1000, discount_percent=0.80,
+                 active=False),
+        ])
+        cls.group_sets = [
+            [],
+            cls.group_a.ids,
+            cls.group_b.ids,
+            (cls.group_a | cls.group_b).ids,
+            cls.group_c.ids,
+            (cls.group_a | cls.group_c).ids,
+        ]
+        cls.amounts = [
+            0, 25, 50, 75, 99.99, 100, 100.01, 110, 120, 135, 150,
+            165, 180, 190, 200, 250, 300, 300.01, 1000,
+        ]
+
+    def _search_best_rule(self, amount, customer_group_ids):
+        """The plain domain search the index replaces, ties to the lowest id."""
+        today = date.today()
+        return self.env["sale.discount.rule"].search([
+            ("min_amount", "<=", amount),
+            ("max_amount", ">=", amount),
+            ("valid_from", "<=", today),
+            ("valid_to", ">=", today),
+            ("customer_group_id", "in", list(customer_group_ids) + [False]),
+        ], order="discount_percent desc, id", limit=1)
+
+    def test_find_best_rule_matches_search(self):
+        Rule = self.env["sale.discount.rule"]
+        for group_ids in self.group_sets:
+            for amount in self.amounts:
+                with self.subTest(groups=group_ids, amount=amount):
+                    self.assertEqual(
+                        Rule._find_best_rule(amount, group_ids),
+                        self._search_best_rule(amount, group_ids))
+
+    def test_bracket_keeps_the_same_rule(self):
+        Rule = self.env["sale.discount.rule"]
+        for group_ids in self.group_sets:
+            for amount in self.amounts:
+                rule, low, high = Rule._find_best_rule_bracket(amount, group_ids)
+                with self.subTest(groups=group_ids, amount=amount):
+                    if low == high and low is not None:
+                        self.assertEqual(low, amount)
+                        continue
+                    self.assertTrue(low is None or low < amount)
+                    self.assertTrue(high is None or amount < high)
+                    probes = [(amount + low) / 2 if low is not None else amount - 1,
+                              (amount + high) / 2 if high is not None else amount + 1]
+                    for probe in probes:
+                        self.assertEqual(rule, self._search_best_rule(probe, group_ids))
@@ -1,3 +1,19 @@
 # -*- coding: utf-8 -*-
+from odoo.tools import split_every
+
+from . import controllers
+from . import models
 from . import wizards
 from . import report
+
+
+def _snapshot_existing_costs(env):
+    """Capture the cost of lines confirmed before the module was installed."""
+    line_ids = env['sale.order.line'].search([
+        ('order_id.state', 'in', ['sale', 'done']),
+        ('display_type', '=', False),
+    ]).ids
+    for batch_ids in split_every(1000, line_ids):
+        lines = env['sale.order.line'].browse(batch_ids)
+        lines._snapshot_profitability_cost()
+        lines.invalidate_recordset()
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     "name": "Sale Profitability Report",
-    'version': '18.0.1.0.0',
+    'version': '18.0.1.1.0',
     'category': 'Sales/Reporting',
     "summary": """ Order-wise revenue, cost, and margin for sales orders """,
     'description': """ This module provides a wizard to analyze sales profitability by:
@@ -9,12 +9,16 @@
                         - Product category  
                         - Customer """,
     'author': 'Rinoy',
-    'depends': ['base', 'sales_team', 'sale_management', 'account', 'stock'],
+    'depends': ['base', 'mail', 'sales_team', 'sale_management', 'account', 'stock', 'call_profiler'],
     'data': [
         "security/ir.model.access.csv",
+        "security/ir_rule.xml",
+        "data/ir_cron.xml",
+        "views/sale_profitability_job_views.xml",
         "wizards/sale_profitability_wizard.xml",
         "report/report_sale_profitability.xml"
     ],
+    'post_init_hook': '_snapshot_existing_costs',
     'license': 'LGPL-3',
     'installable': True,
     'auto_install': False,
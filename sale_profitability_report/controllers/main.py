@@ -0,0 +1,80 @@
+import json
+import tempfile
+from werkzeug.exceptions import BadRequest
+from werkzeug.wsgi import wrap_file
+from odoo import api, fields, http, Command
+from odoo.http import request, content_disposition
+from odoo.addons.call_profiler import profile_call
+
+
+class SaleProfitabilityController(http.Controller):
+
+    @http.route('/sale_profitability_report/xlsx/<int:wizard_id>', type='http', auth='user')
+    def download_profitability_xlsx(self, wizard_id, **kwargs):
+        wizard = request.env['sale.profitability.wizard'].browse(
+            wizard_id).exists()
+        if not wizard:
+            raise request.not_found()
+        wizard.check_access('read')
+
+        # The workbook is spooled to disk and streamed back in chunks, so the
+        # file never has to be held in memory or stored on the wizard.
+        output = tempfile.TemporaryFile()
+        wizard._write_profitability_xlsx(output)
+        size = output.tell()
+        output.seek(0)
+        return request.make_response(
+            wrap_file(request.httprequest.environ, output),
+            headers=[
+                ('Content-Type', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+                ('Content-Length', size),
+                ('Content-Disposition', content_disposition('Sales_Profitability.xlsx')),
+            ])
+
+    @http.route('/sale_profitability_report/rows', type='http', auth='user', methods=['GET'])
+    def profitability_rows(self, start_date, end_date, customer_ids='', category_ids='',
+                           after_id=0, limit=None, **kwargs):
+        """Stream the report rows as JSON Lines, one order per line, by
+        increasing ``order_id``.
+
+        Takes the wizard's filters (``customer_ids`` and ``category_ids``
+        as comma-separated ids). Resume an interrupted pull, or fetch the
+        next page when ``limit`` is given, by passing the ``order_id`` of
+        the last row received as ``after_id``.
+        """
+        try:
+            vals = {
+                'start_date': fields.Date.to_date(start_date),
+                'end_date': fields.Date.to_date(end_date),
+                'customer_ids': [Command.set(self._parse_ids(customer_ids))],
+                'category_ids': [Command.set(self._parse_ids(category_ids))],
+            }
+            after_id = int(after_id)
+            limit = int(limit) if limit else None
+        except ValueError as e:
+            raise BadRequest(str(e))
+        wizard = request.env['sale.profitability.wizard'].create(vals)
+
+        # The rows are produced while the response is sent, after the
+        # request's cursor is closed: they are read on a cursor of their own.
+        registry = request.env.registry
+        uid = request.env.uid
+        context = dict(request.env.context)
+        wizard_id = wizard.id
+
+        def generate():
+            with registry.cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                wizard = env['sale.profitability.wizard'].browse(wizard_id)
+                with profile_call(env, 'sale.profitability.wizard._iter_profitability_records'):
+                    for row in wizard._iter_profitability_records(after_id, limit):
+                        yield json.dumps(row) + '\n'
+
+        return request.make_response(generate(), headers=[
+            ('Content-Type', 'application/x-ndjson'),
+            ('Cache-Control', 'no-store'),
+        ])
+
+    @staticmethod
+    def _parse_ids(value):
+        return [int(item) for item in value.split(',') if item.strip()]
@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+from odoo import api, SUPERUSER_ID
+
+from odoo.addons.sale_profitability_report import _snapshot_existing_costs
+
+
+def migrate(cr, version):
+    """The post_init_hook only runs on install: capture the cost of the
+    lines confirmed before the snapshot existed on upgraded databases."""
+    if not version:
+        return
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    _snapshot_existing_costs(env)
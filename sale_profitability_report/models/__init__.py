@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+from . import sale_profitability_job
+from . import sale_profitability_fact
+from . import sale_profitability_cache
+from . import sale_order
+from . import sale_order_line
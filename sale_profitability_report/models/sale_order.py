@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from odoo import models
+
+
+class SaleOrder(models.Model):
+    _inherit = "sale.order"
+
+    def write(self, vals):
+        report_fields = {'state', 'date_order', 'partner_id', 'order_line'}
+        if report_fields.intersection(vals):
+            self._invalidate_profitability_cache()
+        res = super().write(vals)
+        if report_fields.intersection(vals):
+            self._invalidate_profitability_cache()
+        return res
+
+    def action_confirm(self):
+        res = super().action_confirm()
+        self.filtered(
+            lambda o: o.state == 'sale'
+        ).order_line._snapshot_profitability_cost()
+        return res
+
+    def _invalidate_profitability_cache(self):
+        """Drop cached profitability rows that may include these orders."""
+        orders = self.filtered(lambda o: o.state in ('sale', 'done'))
+        self.env['sale.profitability.cache']._invalidate_orders(orders)
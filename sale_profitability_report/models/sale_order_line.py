@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from odoo import api, fields, models
+
+
+class SaleOrderLine(models.Model):
+    _inherit = "sale.order.line"
+
+    profitability_unit_cost = fields.Float(
+        string="Unit Cost at Sale", digits='Product Price', readonly=True, copy=False,
+        help="Product cost captured when the order was confirmed.")
+    profitability_cost = fields.Float(
+        string="Cost at Sale", compute='_compute_profitability_cost', store=True,
+        help="Unit cost at sale multiplied by the ordered quantity.")
+
+    @api.depends('profitability_unit_cost', 'product_uom_qty')
+    def _compute_profitability_cost(self):
+        for line in self:
+            line.profitability_cost = line.profitability_unit_cost * line.product_uom_qty
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super().create(vals_list)
+        lines.filtered(
+            lambda l: l.order_id.state in ('sale', 'done')
+        )._snapshot_profitability_cost()
+        lines.order_id._invalidate_profitability_cache()
+        return lines
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'product_id' in vals:
+            self.filtered(
+                lambda l: l.order_id.state in ('sale', 'done')
+            )._snapshot_profitability_cost()
+        self.order_id._invalidate_profitability_cache()
+        return res
+
+    def unlink(self):
+        self.order_id._invalidate_profitability_cache()
+        return super().unlink()
+
+    def _snapshot_profitability_cost(self):
+        """Store the current product cost on the lines, with one write per
+        company and product."""
+        lines = self.filtered(lambda l: not l.display_type and l.product_id)
+        for company, company_lines in lines.grouped('company_id').items():
+            company_lines = company_lines.with_company(company)
+            for product, product_lines in company_lines.grouped('product_id').items():
+                product_lines.profitability_unit_cost = product.standard_price
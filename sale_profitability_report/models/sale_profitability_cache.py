@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+from odoo import api, fields, models
+
+
+class SaleProfitabilityCache(models.Model):
+    _name = "sale.profitability.cache"
+    _description = "Sales Profitability Report Cache"
+    _order = "last_used desc"
+
+    key = fields.Char(string="Fingerprint", required=True, index=True, readonly=True)
+    start_date = fields.Date(string="Start Date", required=True, readonly=True)
+    end_date = fields.Date(string="End Date", required=True, readonly=True)
+    company_ids = fields.Many2many(
+        "res.company", "sale_profitability_cache_company_rel", "cache_id", "company_id",
+        string="Companies", readonly=True,
+        help="Companies whose orders the cached rows are computed from.")
+    rows = fields.Json(string="Rows", readonly=True)
+    valid = fields.Boolean(string="Valid", default=True, readonly=True)
+    hit_count = fields.Integer(string="Hits", readonly=True)
+    miss_count = fields.Integer(string="Misses", readonly=True)
+    last_used = fields.Datetime(string="Last Used", index=True, readonly=True)
+
+    _sql_constraints = [
+        ('key_uniq', 'unique(key)', "The report fingerprint must be unique."),
+    ]
+
+    @api.model
+    def _make_key(self, wizard):
+        """Fingerprint the filters of ``wizard`` together with the companies
+        the rows are computed for."""
+        key = [
+            str(wizard.start_date),
+            str(wizard.end_date),
+            sorted(wizard.customer_ids.ids),
+            sorted(wizard.category_ids.ids),
+            self.env.company.id,
+            sorted(self.env.companies.ids),
+        ]
+        return hashlib.sha1(json.dumps(key).encode()).hexdigest()
+
+    @api.model
+    def _get_max_entries(self):
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'sale_profitability_report.cache_size', 100))
+
+    @api.model
+    def _get_max_rows(self):
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'sale_profitability_report.cache_max_rows', 20000))
+
+    @api.model
+    def _get_rows(self, key):
+        """Return the cached rows for ``key``, or ``None`` on a miss."""
+        entry = self.sudo().search(
+            [('key', '=', key), ('valid', '=', True)], limit=1)
+        if not entry:
+            return None
+        self.env.cr.execute("""
+            UPDATE sale_profitability_cache
+               SET hit_count = hit_count + 1, last_used = now() at time zone 'UTC'
+             WHERE id = %s
+        """, [entry.id])
+        return entry.rows
+
+    @api.model
+    def _set_rows(self, key, wizard, rows):
+        """Upsert ``rows`` under ``key``, so concurrent misses do not collide."""
+        self.env.cr.execute("""
+            INSERT INTO sale_profitability_cache
+                   (key, start_date, end_date, rows, valid, miss_count, hit_count,
+                    last_used, create_uid, create_date, write_uid, write_date)
+            VALUES (%(key)s, %(start_date)s, %(end_date)s, %(rows)s, TRUE, 1, 0,
+                    %(now)s, %(uid)s, %(now)s, %(uid)s, %(now)s)
+            ON CONFLICT (key) DO UPDATE
+               SET rows = EXCLUDED.rows,
+                   valid = TRUE,
+                   miss_count = sale_profitability_cache.miss_count + 1,
+                   last_used = EXCLUDED.last_used,
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+         RETURNING id, xmax = 0
+        """, {
+            'key': key,
+            'start_date': wizard.start_date,
+            'end_date': wizard.end_date,
+            'rows': json.dumps(rows),
+            'now': fields.Datetime.now(),
+            'uid': self.env.uid,
+        })
+        entry_id, inserted = self.env.cr.fetchone()
+        # The companies are part of the key, so an existing entry already
+        # has the same ones.
+        self.env.cr.execute("""
+            INSERT INTO sale_profitability_cache_company_rel (cache_id, company_id)
+            SELECT %s, unnest(%s)
+            ON CONFLICT DO NOTHING
+        """, [entry_id, self.env.companies.ids])
+        self.invalidate_model()
+        if inserted:
+            self._evict()
+
+    @api.model
+    def _evict(self):
+        """Drop the least recently used entries beyond the configured size."""
+        stale = self.sudo().search([], offset=self._get_max_entries())
+        stale.unlink()
+
+    @api.model
+    def _invalidate_orders(self, orders):
+        """Invalidate the entries whose date range and companies cover any
+        of ``orders``."""
+        orders = orders.filtered('date_order')
+        if not orders:
+            return
+        dates = [order.date_order.date() for order in orders]
+        self.sudo().search([
+            ('valid', '=', True),
+            ('start_date', '<=', max(dates)),
+            ('end_date', '>=', min(dates)),
+            ('company_ids', 'in', orders.company_id.ids),
+        ]).write({'valid': False, 'rows': False})
+
+    @api.model
+    def get_cache_stats(self):
+        """Return hit/miss counters of the report cache, for monitoring."""
+        [(entries, hits, misses)] = self.sudo()._read_group(
+            [], aggregates=['__count', 'hit_count:sum', 'miss_count:sum'])
+        return {
+            'entries': entries,
+            'hits': hits or 0,
+            'misses': misses or 0,
+        }
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+from collections import defaultdict
+from datetime import timedelta
+from odoo import api, fields, models, tools
+from odoo.tools import split_every
+
+REFRESH_PARAM = 'sale_profitability_report.fact_refreshed_at'
+# Orders written by transactions still running when the previous refresh
+# started are only visible afterwards, so each refresh looks back a little.
+REFRESH_OVERLAP = timedelta(minutes=10)
+REFRESH_BATCH_SIZE = 1000
+
+
+class SaleProfitabilityFact(models.Model):
+    _name = "sale.profitability.fact"
+    _description = "Daily Sales Profitability Fact"
+    _order = "date desc, order_id"
+
+    date = fields.Date(string="Date", required=True, index=True, readonly=True)
+    order_id = fields.Many2one(
+        "sale.order", string="Order", required=True, index=True,
+        ondelete="cascade", readonly=True)
+    partner_id = fields.Many2one(
+        "res.partner", string="Customer", index=True, readonly=True)
+    categ_id = fields.Many2one(
+        "product.category", string="Product Category", index=True, readonly=True)
+    company_id = fields.Many2one(
+        "res.company", string="Company", index=True, readonly=True)
+    revenue = fields.Float(string="Revenue", readonly=True)
+    cost = fields.Float(string="Cost", readonly=True)
+
+    _sql_constraints = [
+        ('order_categ_uniq', 'unique(order_id, categ_id)',
+         "Only one profitability fact per order and category is allowed."),
+    ]
+
+    def init(self):
+        # The incremental refresh looks orders and lines up by write_date.
+        tools.create_index(
+            self.env.cr, "sale_order_write_date_index", "sale_order", ["write_date"])
+        tools.create_index(
+            self.env.cr, "sale_order_line_write_date_index", "sale_order_line", ["write_date"])
+
+    @api.model
+    def _get_refreshed_at(self):
+        """Return when the facts were last refreshed, or ``False``."""
+        refreshed_at = self.env['ir.config_parameter'].sudo().get_param(REFRESH_PARAM)
+        return fields.Datetime.to_datetime(refreshed_at) if refreshed_at else False
+
+    @api.model
+    def _is_available(self):
+        """Whether the fact table has been built at least once."""
+        return bool(self._get_refreshed_at())
+
+    @api.model
+    def _cron_refresh(self):
+        self._refresh(commit=True)
+
+    @api.model
+    def _refresh(self, commit=False):
+        """Rebuild the facts of every order confirmed or changed since the
+        last refresh; the first run builds the whole table."""
+        ICP = self.env['ir.config_parameter'].sudo()
+        refreshed_at = ICP.get_param(REFRESH_PARAM)
+        started_at = self.env.cr.now()
+
+        if refreshed_at:
+            since = fields.Datetime.to_datetime(refreshed_at) - REFRESH_OVERLAP
+            order_ids = set(self.env['sale.order'].sudo().search(
+                [('write_date', '>=', since)]).ids)
+            order_ids.update(order.id for [order] in self.env['sale.order.line'].sudo()._read_group(
+                [('write_date', '>=', since)], groupby=['order_id']))
+        else:
+            order_ids = set(self.env['sale.order'].sudo().search(
+                [('state', 'in', ['sale', 'done'])]).ids)
+
+        for batch_ids in split_every(REFRESH_BATCH_SIZE, sorted(order_ids)):
+            self._refresh_orders(batch_ids)
+            if commit:
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+
+        ICP.set_param(REFRESH_PARAM, fields.Datetime.to_string(started_at))
+
+    @api.model
+    def _refresh_orders(self, order_ids):
+        self.sudo().search([('order_id', 'in', list(order_ids))]).unlink()
+        self.sudo().create(self._prepare_fact_vals(order_ids))
+        self.env['sale.profitability.cache']._invalidate_orders(
+            self.env['sale.order'].browse(order_ids))
+
+    @api.model
+    def _prepare_fact_vals(self, order_ids):
+        groups = self.env['sale.order.line'].sudo()._read_group(
+            [
+                ('order_id', 'in', list(order_ids)),
+                ('order_id.state', 'in', ['sale', 'done']),
+                ('display_type', '=', False),
+            ],
+            groupby=['order_id', 'product_id'],
+            aggregates=['price_total:sum', 'profitability_cost:sum'],
+        )
+        facts = defaultdict(lambda: {'revenue': 0.0, 'cost': 0.0})
+        for order, product, revenue, cost in groups:
+            fact = facts[order, product.categ_id]
+            fact['revenue'] += revenue
+            fact['cost'] += cost
+
+        return [{
+            'date': order.date_order.date(),
+            'order_id': order.id,
+            'partner_id': order.partner_id.id,
+            'categ_id': category.id,
+            'company_id': order.company_id.id,
+            'revenue': fact['revenue'],
+            'cost': fact['cost'],
+        } for (order, category), fact in facts.items()]
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+import logging
+import tempfile
+from datetime import timedelta
+from markupsafe import Markup
+from odoo import api, fields, models, Command, _
+
+_logger = logging.getLogger(__name__)
+
+
+class SaleProfitabilityJob(models.Model):
+    _name = "sale.profitability.job"
+    _inherit = ["mail.thread"]
+    _description = "Sales Profitability Report Job"
+    _order = "id desc"
+
+    name = fields.Char(
+        string="Reference", required=True, readonly=True, copy=False,
+        default=lambda self: _("New"))
+    report_type = fields.Selection([
+        ('pdf', 'PDF'),
+        ('xlsx', 'Excel'),
+    ], string="Report Type", required=True, readonly=True)
+    state = fields.Selection([
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string="Status", default='queued', required=True, readonly=True, tracking=True)
+    progress = fields.Float(string="Progress", readonly=True)
+    start_date = fields.Date(string="Start Date", required=True, readonly=True)
+    end_date = fields.Date(string="End Date", required=True, readonly=True)
+    customer_ids = fields.Many2many(
+        "res.partner", string="Customers", readonly=True)
+    category_ids = fields.Many2many(
+        "product.category", string="Product Categories", readonly=True)
+    user_id = fields.Many2one(
+        "res.users", string="Requested By", required=True, readonly=True,
+        default=lambda self: self.env.user)
+    company_id = fields.Many2one(
+        "res.company", string="Company", required=True, readonly=True,
+        default=lambda self: self.env.company)
+    attachment_id = fields.Many2one(
+        "ir.attachment", string="Report File", readonly=True, copy=False)
+    error_message = fields.Text(string="Error", readonly=True, copy=False)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if vals.get('name', _("New")) == _("New"):
+                vals['name'] = _("Profitability %(start)s - %(end)s",
+                                 start=vals.get('start_date'), end=vals.get('end_date'))
+        return super().create(vals_list)
+
+    @api.model
+    def _cron_run_jobs(self):
+        self._fail_stale_jobs()
+        for job in self.search([('state', '=', 'queued')], order='id'):
+            job._run()
+
+    @api.model
+    def _fail_stale_jobs(self):
+        """Fail the running jobs whose worker was killed (time or memory
+        limit) without recording it.
+
+        A running job commits its progress after each date window, so one
+        not written to for longer than the timeout is no longer running.
+        It is failed rather than requeued, since it would most likely be
+        killed again.
+        """
+        timeout = int(self.env['ir.config_parameter'].sudo().get_param(
+            'sale_profitability_report.job_timeout_minutes', 120))
+        stale = self.search([
+            ('state', '=', 'running'),
+            ('write_date', '<', self.env.cr.now() - timedelta(minutes=max(timeout, 1))),
+        ])
+        for job in stale:
+            _logger.warning("Profitability report job %s timed out", job.id)
+            job.write({
+                'state': 'failed',
+                'error_message': _("The report was interrupted before completion."),
+            })
+            job._notify_failed()
+        self.env.cr.commit()  # pylint: disable=invalid-commit
+
+    def _run(self):
+        self.ensure_one()
+        self.write({'state': 'running', 'progress': 0.0})
+        self.env.cr.commit()  # pylint: disable=invalid-commit
+        try:
+            wizard = self.env['sale.profitability.wizard'].with_user(
+                self.user_id).with_company(self.company_id).create({
+                    'start_date': self.start_date,
+                    'end_date': self.end_date,
+                    'customer_ids': [Command.set(self.customer_ids.ids)],
+                    'category_ids': [Command.set(self.category_ids.ids)],
+                })
+            rows = wizard._iter_profitability_rows(
+                self._iter_order_data(wizard))
+            if self.report_type == 'xlsx':
+                content, filename = self._render_xlsx(wizard, rows)
+            else:
+                content, filename = self._render_pdf(wizard, rows)
+        except Exception as e:
+            self.env.cr.rollback()
+            _logger.exception(
+                "Profitability report job %s failed", self.id)
+            self.write({'state': 'failed', 'error_message': str(e)})
+            self._notify_failed()
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+            return
+
+        attachment = self.env['ir.attachment'].create({
+            'name': filename,
+            'raw': content,
+            'res_model': self._name,
+            'res_id': self.id,
+        })
+        self.write({
+            'state': 'done',
+            'progress': 100.0,
+            'attachment_id': attachment.id,
+        })
+        self._notify_done()
+        self.env.cr.commit()  # pylint: disable=invalid-commit
+
+    def _iter_order_data(self, wizard):
+        """Aggregate the report one date window at a time, committing the
+        job's progress after each window has been consumed."""
+        chunk_days = int(self.env['ir.config_parameter'].sudo().get_param(
+            'sale_profitability_report.background_chunk_days', 30))
+        partitions = wizard._get_profitability_partitions(max(chunk_days, 1))
+        for index, (date_from, date_before) in enumerate(partitions, start=1):
+            yield wizard._aggregate_profitability(date_from, date_before)
+            self.progress = 100.0 * index / len(partitions)
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+
+    def _render_xlsx(self, wizard, rows):
+        with tempfile.TemporaryFile() as output:
+            wizard._write_profitability_xlsx(output, rows=rows)
+            output.seek(0)
+            return output.read(), "Sales_Profitability.xlsx"
+
+    def _render_pdf(self, wizard, rows):
+        data = dict(wizard._get_report_data(), lines=list(rows))
+        content, _report_type = self.env['ir.actions.report'].with_user(
+            self.user_id)._render_qweb_pdf(
+                'sale_profitability_report.action_report_sale_profitability', data=data)
+        return content, "Sales_Profitability.pdf"
+
+    def _notify_done(self):
+        self.ensure_one()
+        url = '/web/content/%s?download=true' % self.attachment_id.id
+        link = Markup('<a href="%s" target="_blank">%s</a>') % (url, self.attachment_id.name)
+        body = Markup(_("Your Sales Profitability report is ready: %s")) % link
+        self.message_post(
+            body=body,
+            partner_ids=self.user_id.partner_id.ids,
+            subtype_xmlid='mail.mt_comment',
+        )
+
+    def _notify_failed(self):
+        self.ensure_one()
+        self.message_post(
+            body=_("Your Sales Profitability report could not be generated: %s",
+                   self.error_message),
+            partner_ids=self.user_id.partner_id.ids,
+            subtype_xmlid='mail.mt_comment',
+        )
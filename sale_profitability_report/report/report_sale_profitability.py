@@ -1,4 +1,6 @@
 from odoo import models, api
+from odoo.tools import split_every
+from odoo.addons.call_profiler import profiled
 
 
 class SaleProfitabilityReport(models.AbstractModel):
@@ -6,9 +8,21 @@ class SaleProfitabilityReport(models.AbstractModel):
     _description = 'Sales Profitability Report'
 
     @api.model
+    @profiled()
     def _get_report_values(self, docids, data=None):
         if not data:
             data = {}
+        lines = data.get('lines')
+        if lines is None and data.get('wizard_id'):
+            wizard = self.env['sale.profitability.wizard'].browse(
+                data['wizard_id'])
+            lines = wizard._iter_profitability_data()
+        # Each chunk is rendered in its own article, which wkhtmltopdf lays
+        # out as a separate document before merging them into one PDF.
+        chunk_size = int(self.env['ir.config_parameter'].sudo().get_param(
+            'sale_profitability_report.pdf_chunk_size', 100))
+        line_chunks = list(split_every(max(chunk_size, 1), lines or [])) or [()]
         return {
             'data': data,
+            'line_chunks': line_chunks,
         }
@@ -1,9 +1,18 @@
-from odoo import models, fields, api, _
-import base64
-import io
+from odoo import models, fields, api, Command, _
+import logging
+import tempfile
+import time
 import xlsxwriter
 from collections import defaultdict
-from odoo.exceptions import ValidationError
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from odoo.exceptions import UserError, ValidationError
+from odoo.tools import split_every
+from odoo.addons.call_profiler import profiled
+
+_logger = logging.getLogger(__name__)
+
+PROFITABILITY_BATCH_SIZE = 1000
 
 
 class SaleProfitabilityWizard(models.TransientModel):
@@ -16,8 +25,19 @@ class SaleProfitabilityWizard(models.TransientModel):
         "res.partner", string="Customers")
     category_ids = fields.Many2many(
         "product.category", string="Product Categories")
-    excel_file = fields.Binary('File', readonly=True)
-    file_name = fields.Char('Filename', readonly=True)
+    job_id = fields.Many2one(
+        "sale.profitability.job", string="Background Job", readonly=True)
+    job_state = fields.Selection(related="job_id.state")
+    job_progress = fields.Float(related="job_id.progress")
+    facts_refreshed_at = fields.Datetime(
+        string="Figures As Of", compute="_compute_facts_refreshed_at",
+        help="The report reads the daily facts, refreshed periodically: "
+             "orders changed since this time are not included yet.")
+
+    def _compute_facts_refreshed_at(self):
+        refreshed_at = self.env['sale.profitability.fact']._get_refreshed_at()
+        for rec in self:
+            rec.facts_refreshed_at = refreshed_at
 
     @api.constrains('start_date', 'end_date')
     def _check_date_range(self):
@@ -27,22 +47,67 @@ class SaleProfitabilityWizard(models.TransientModel):
                     _("End Date must be greater than or equal to Start Date."))
 
     def action_view_report(self):
-        data = {
+        if self._should_run_in_background():
+            return self._enqueue_profitability_job('pdf')
+        data = self._get_report_data()
+        return self.env.ref('sale_profitability_report.action_report_sale_profitability').report_action(None, data=data)
+
+    def _get_report_data(self):
+        """Return the report ``data`` payload. Rows are not embedded: the
+        report computes them from ``wizard_id`` when rendering."""
+        return {
+            'wizard_id': self.id,
             'start_date': self.start_date.strftime('%m-%d-%Y'),
             'end_date': self.end_date.strftime('%m-%d-%Y'),
             'customer_ids': self.customer_ids.mapped('name'),
             'category_ids': self.category_ids.mapped('name'),
-            'lines': self._get_profitability_data(),
         }
-        return self.env.ref('sale_profitability_report.action_report_sale_profitability').report_action(None, data=data)
 
-    def _get_profitability_data(self):
+    def _should_run_in_background(self):
+        """Whether the report is expected to be too large to build within
+        the HTTP request, based on the number of matching order lines."""
+        self.ensure_one()
+        threshold = int(self.env['ir.config_parameter'].sudo().get_param(
+            'sale_profitability_report.background_row_threshold', 100000))
+        if threshold <= 0:
+            return False
+        line_count = self.env['sale.order.line'].search_count(
+            self._get_profitability_domain(), limit=threshold + 1)
+        return line_count > threshold
+
+    def _enqueue_profitability_job(self, report_type):
+        self.ensure_one()
+        job = self.env['sale.profitability.job'].create({
+            'report_type': report_type,
+            'start_date': self.start_date,
+            'end_date': self.end_date,
+            'customer_ids': [Command.set(self.customer_ids.ids)],
+            'category_ids': [Command.set(self.category_ids.ids)],
+        })
+        self.job_id = job
+        self.env.ref(
+            'sale_profitability_report.ir_cron_run_profitability_jobs')._trigger()
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    def _get_profitability_domain(self, date_from=False, date_before=False):
+        """Return the ``sale.order.line`` domain of the report, optionally
+        narrowed to orders dated in ``[date_from, date_before)``."""
         line_domain = [
             ('order_id.date_order', '>=', self.start_date),
             ('order_id.date_order', '<=', self.end_date),
             ('order_id.state', 'in', ['sale', 'done']),
             ('display_type', '=', False),
         ]
+        if date_from:
+            line_domain.append(('order_id.date_order', '>=', date_from))
+        if date_before:
+            line_domain.append(('order_id.date_order', '<', date_before))
 
         if self.customer_ids:
             line_domain.append(
@@ -51,62 +116,233 @@ class SaleProfitabilityWizard(models.TransientModel):
         if self.category_ids:
             line_domain.append(
                 ('product_id.categ_id', 'in', self.category_ids.ids))
+        return line_domain
+
+    def _get_profitability_fact_domain(self, date_from=False, date_before=False):
+        """Same as :meth:`_get_profitability_domain`, for
+        ``sale.profitability.fact``."""
+        fact_domain = [
+            ('date', '>=', self.start_date),
+            ('date', '<=', self.end_date),
+        ]
+        if date_from:
+            fact_domain.append(('date', '>=', date_from))
+        if date_before:
+            fact_domain.append(('date', '<', date_before))
+
+        if self.customer_ids:
+            fact_domain.append(('partner_id', 'in', self.customer_ids.ids))
+
+        if self.category_ids:
+            fact_domain.append(('categ_id', 'in', self.category_ids.ids))
+        return fact_domain
 
-        all_lines = self.env['sale.order.line'].search(line_domain)
-        if not all_lines:
-            return []
+    @profiled()
+    def _aggregate_profitability(self, date_from=False, date_before=False):
+        """Aggregate the report per order, restricted to orders dated in
+        ``[date_from, date_before)`` when given.
 
-        all_lines.mapped('product_id.categ_id')
-        all_lines.mapped('order_id.partner_id')
+        The pre-aggregated ``sale.profitability.fact`` table is used once it
+        has been built, otherwise order lines are aggregated directly.
 
+        :return: dict of order id -> {'revenue', 'cost', 'categories'},
+                 in the same order as ``sale.order``'s default ordering
+        """
+        if self.env['sale.profitability.fact']._is_available():
+            return self._aggregate_profitability_facts(
+                self._get_profitability_fact_domain(date_from, date_before))
+        return self._aggregate_profitability_lines(
+            self._get_profitability_domain(date_from, date_before))
+
+    def _aggregate_profitability_facts(self, fact_domain):
+        groups = self.env['sale.profitability.fact']._read_group(
+            fact_domain,
+            groupby=['order_id', 'categ_id'],
+            aggregates=['revenue:sum', 'cost:sum'],
+            order='order_id',
+        )
         order_data = defaultdict(lambda: {
             'revenue': 0.0,
             'cost': 0.0,
-            'margin': 0.0,
             'categories': set()
         })
+        for order, category, revenue, cost in groups:
+            order_bucket = order_data[order.id]
+            order_bucket['revenue'] += revenue
+            order_bucket['cost'] += cost
+            if category:
+                order_bucket['categories'].add(category.name)
+        return order_data
 
-        for line in all_lines:
-            order_bucket = order_data[line.order_id.id]
-            product = line.product_id
-            revenue = line.price_total
-            cost = product.standard_price * line.product_uom_qty
+    def _aggregate_profitability_lines(self, line_domain):
+        """Aggregate order lines per order with a single grouped query.
 
+        Lines are grouped by order and product so revenue and the cost
+        captured at confirmation are summed in the database; categories are
+        then derived from the (much smaller) set of distinct products.
+        """
+        groups = self.env['sale.order.line']._read_group(
+            line_domain,
+            groupby=['order_id', 'product_id'],
+            aggregates=['price_total:sum', 'profitability_cost:sum'],
+            order='order_id',
+        )
+        if not groups:
+            return {}
+
+        products = self.env['product.product'].browse(
+            {product.id for _order, product, _revenue, _cost in groups if product})
+        products.mapped('categ_id.name')
+
+        order_data = defaultdict(lambda: {
+            'revenue': 0.0,
+            'cost': 0.0,
+            'categories': set()
+        })
+        for order, product, revenue, cost in groups:
+            order_bucket = order_data[order.id]
             order_bucket['revenue'] += revenue
             order_bucket['cost'] += cost
-
             if product.categ_id:
                 order_bucket['categories'].add(product.categ_id.name)
+        return order_data
+
+    def _get_profitability_partitions(self, days):
+        """Split the wizard's date range into windows of ``days`` days.
+
+        Each window is returned as a ``(date_from, date_before)`` pair to
+        pass to :meth:`_aggregate_profitability`, where ``False`` leaves that
+        side bounded by the wizard's own dates only. Windows are disjoint,
+        cover the whole range and are ordered newest first, matching the
+        order in which ``sale.order`` rows are reported.
+        """
+        self.ensure_one()
+        bounds = []
+        bound = self.end_date - timedelta(days=days - 1)
+        while bound > self.start_date:
+            bounds.append(bound)
+            bound -= timedelta(days=days)
+
+        partitions = []
+        date_before = False
+        for date_from in bounds + [False]:
+            partitions.append((date_from, date_before))
+            date_before = date_from
+        return partitions
+
+    def _get_parallel_workers(self):
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'sale_profitability_report.parallel_workers', 0))
+
+    def _aggregate_profitability_parallel(self, workers):
+        """Aggregate the report with ``workers`` threads, each one running the
+        grouped query of one date window on its own cursor.
+
+        The aggregation itself runs in PostgreSQL, so threads are enough to
+        spread it over several database backends. Partial results are merged
+        in window order, which keeps the result identical to
+        :meth:`_aggregate_profitability`.
+        """
+        self.ensure_one()
+        days = int(self.env['ir.config_parameter'].sudo().get_param(
+            'sale_profitability_report.parallel_partition_days', 30))
+        partitions = self._get_profitability_partitions(max(days, 1))
+        if self.env['sale.profitability.fact']._is_available():
+            method = '_aggregate_profitability_facts'
+            domains = [self._get_profitability_fact_domain(*partition)
+                       for partition in partitions]
+        else:
+            method = '_aggregate_profitability_lines'
+            domains = [self._get_profitability_domain(*partition)
+                       for partition in partitions]
+
+        def aggregate(domain):
+            with self.env.registry.cursor() as cr:
+                env = self.env(cr=cr)
+                return getattr(env[self._name], method)(domain)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            partials = list(executor.map(aggregate, domains))
 
+        order_data = {}
+        for partial in partials:
+            order_data.update(partial)
+        return order_data
+
+    def _benchmark_parallel(self, worker_counts=(1, 2, 4, 8), repeat=3):
+        """Time :meth:`_aggregate_profitability_parallel` for each number of
+        workers in ``worker_counts`` and check the results are identical.
+
+        Meant to be run from ``odoo-bin shell`` on a copy of production data.
+
+        :return: list of dicts with ``workers``, ``seconds`` (best of
+                 ``repeat`` runs) and ``speedup`` relative to one worker
+        """
+        self.ensure_one()
+        reference = self._aggregate_profitability()
         results = []
-        orders = self.env['sale.order'].browse(list(order_data.keys()))
+        for workers in worker_counts:
+            timings = []
+            for _i in range(repeat):
+                start = time.perf_counter()
+                order_data = self._aggregate_profitability_parallel(workers)
+                timings.append(time.perf_counter() - start)
+                if list(order_data.items()) != list(reference.items()):
+                    raise UserError(_(
+                        "Parallel aggregation with %s workers differs from the sequential result.",
+                        workers))
+            results.append({'workers': workers, 'seconds': min(timings)})
+        baseline = results[0]['seconds']
+        for result in results:
+            result['speedup'] = baseline / result['seconds'] if result['seconds'] else 0.0
+            _logger.info(
+                "Profitability aggregation: %(workers)s workers, %(seconds).3fs, speedup x%(speedup).2f",
+                result)
+        return results
+
+    def _iter_profitability_rows(self, order_data_chunks):
+        """Yield report rows for each ``order_data`` in ``order_data_chunks``,
+        followed by the TOTAL row.
 
+        Orders are fetched in batches so only one batch of ``sale.order``
+        records is held in the cache at a time. Nothing is yielded when no
+        chunk holds any order.
+        """
+        SaleOrder = self.env['sale.order']
         sno = 1
+        has_orders = False
         total_revenue = total_cost = total_margin = 0.0
-        for order in orders:
-            data = order_data[order.id]
-            if data['revenue'] == 0.0 and data['cost'] == 0.0:
-                continue
-            revenue = data['revenue']
-            cost = data['cost']
-            margin = revenue - cost
-
-            total_revenue += revenue
-            total_cost += cost
-            total_margin += margin
-
-            results.append({
-                'sno': sno,
-                'order': order.name,
-                'customer': order.partner_id.name,
-                'date': order.date_order.strftime('%m-%d-%Y'),
-                'category': ', '.join(sorted(data['categories'])) or 'Uncategorized',
-                'revenue': revenue,
-                'cost': data['cost'],
-                'margin': margin,
-            })
-            sno += 1
-        results.append({
+        for order_data in order_data_chunks:
+            has_orders = has_orders or bool(order_data)
+            for order_ids in split_every(PROFITABILITY_BATCH_SIZE, order_data):
+                orders = SaleOrder.browse(order_ids)
+                for order in orders:
+                    data = order_data[order.id]
+                    if data['revenue'] == 0.0 and data['cost'] == 0.0:
+                        continue
+                    revenue = data['revenue']
+                    cost = data['cost']
+                    margin = revenue - cost
+
+                    total_revenue += revenue
+                    total_cost += cost
+                    total_margin += margin
+
+                    yield {
+                        'sno': sno,
+                        'order': order.name,
+                        'customer': order.partner_id.name,
+                        'date': order.date_order.strftime('%m-%d-%Y'),
+                        'category': ', '.join(sorted(data['categories'])) or 'Uncategorized',
+                        'revenue': revenue,
+                        'cost': data['cost'],
+                        'margin': margin,
+                    }
+                    sno += 1
+                orders.invalidate_recordset()
+        if not has_orders:
+            return
+        yield {
             'sno': '',
             'order': 'TOTAL',
             'customer': '',
@@ -115,13 +351,165 @@ class SaleProfitabilityWizard(models.TransientModel):
             'revenue': total_revenue,
             'cost': total_cost,
             'margin': total_margin,
-        })
-        return results
+        }
+
+    def _iter_profitability_data(self):
+        """Yield the report rows, served from ``sale.profitability.cache``
+        when the same filters were computed before.
+
+        Otherwise orders are aggregated one keyset page at a time (or all at
+        once when parallel aggregation is configured), and the rows are
+        cached once consumed, unless there are too many of them.
+        """
+        Cache = self.env['sale.profitability.cache']
+        key = Cache._make_key(self)
+        rows = Cache._get_rows(key)
+        if rows is not None:
+            return iter(rows)
+
+        workers = self._get_parallel_workers()
+        if workers > 1:
+            order_data_chunks = [self._aggregate_profitability_parallel(workers)]
+        else:
+            order_data_chunks = self._iter_profitability_pages()
+        return self._cache_profitability_rows(
+            key, self._iter_profitability_rows(order_data_chunks))
+
+    def _cache_profitability_rows(self, key, rows):
+        """Yield ``rows`` and store them in the cache once exhausted, unless
+        there are more than the configured maximum."""
+        Cache = self.env['sale.profitability.cache']
+        max_rows = Cache._get_max_rows()
+        cached = []
+        for row in rows:
+            if cached is not None:
+                cached.append(row)
+                if len(cached) > max_rows:
+                    cached = None
+            yield row
+        if cached is not None:
+            Cache._set_rows(key, self, cached)
+
+    def _iter_profitability_pages(self):
+        """Yield the ``order_data`` of the report one page of orders at a
+        time, in ``sale.order``'s ``date_order desc, id desc`` order.
+
+        Pages are read by keyset (orders strictly after the last one of the
+        previous page), so each query stays cheap however deep the export
+        goes, and only one page of orders is held in memory.
+        """
+        self.ensure_one()
+        SaleOrder = self.env['sale.order']
+        order_domain = self._get_profitability_order_domain()
+        keyset = []
+        while True:
+            orders = SaleOrder.search(
+                order_domain + keyset,
+                order='date_order desc, id desc', limit=PROFITABILITY_BATCH_SIZE)
+            if not orders:
+                return
+            yield self._aggregate_profitability_orders(orders)
+            last = orders[-1]
+            keyset = [
+                '|', ('date_order', '<', last.date_order),
+                '&', ('date_order', '=', last.date_order), ('id', '<', last.id),
+            ]
+            orders.invalidate_recordset()
+
+    def _aggregate_profitability_orders(self, orders):
+        """Aggregate the report restricted to ``orders``."""
+        if self.env['sale.profitability.fact']._is_available():
+            return self._aggregate_profitability_facts(
+                self._get_profitability_fact_domain() + [('order_id', 'in', orders.ids)])
+        return self._aggregate_profitability_lines(
+            self._get_profitability_domain() + [('order_id', 'in', orders.ids)])
+
+    def _get_profitability_order_domain(self):
+        """Same filters as :meth:`_get_profitability_domain`, for
+        ``sale.order``: orders with at least one matching line."""
+        order_domain = [
+            ('date_order', '>=', self.start_date),
+            ('date_order', '<=', self.end_date),
+            ('state', 'in', ['sale', 'done']),
+        ]
+        if self.customer_ids:
+            order_domain.append(('partner_id', 'in', self.customer_ids.ids))
+
+        line_domain = [('display_type', '=', False)]
+        if self.category_ids:
+            line_domain.append(('product_id.categ_id', 'in', self.category_ids.ids))
+        order_domain.append(('order_line', 'any', line_domain))
+        return order_domain
+
+    def _iter_profitability_records(self, after_id=0, limit=None):
+        """Yield one row per order of the report, by increasing order id.
+
+        Orders are read in keyset pages (``id > after_id``), so memory does
+        not grow with the size of the report and an interrupted pull can be
+        resumed by passing the ``order_id`` of the last row received.
+
+        :param after_id: only yield orders with a greater id
+        :param limit: maximum number of rows to yield, unlimited if ``None``
+        """
+        self.ensure_one()
+        SaleOrder = self.env['sale.order']
+        order_domain = self._get_profitability_order_domain()
+        count = 0
+        while limit is None or count < limit:
+            orders = SaleOrder.search(
+                order_domain + [('id', '>', after_id)],
+                order='id', limit=PROFITABILITY_BATCH_SIZE)
+            if not orders:
+                return
+            order_data = self._aggregate_profitability_orders(orders)
+            for order in orders:
+                data = order_data.get(order.id)
+                if not data or (data['revenue'] == 0.0 and data['cost'] == 0.0):
+                    continue
+                yield {
+                    'order_id': order.id,
+                    'order': order.name,
+                    'customer_id': order.partner_id.id,
+                    'customer': order.partner_id.name,
+                    'date': fields.Datetime.to_string(order.date_order),
+                    'categories': sorted(data['categories']),
+                    'revenue': data['revenue'],
+                    'cost': data['cost'],
+                    'margin': data['revenue'] - data['cost'],
+                }
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+            after_id = orders[-1].id
+            orders.invalidate_recordset()
 
     def action_export_excel(self):
         self.ensure_one()
-        output = io.BytesIO()
-        workbook = xlsxwriter.Workbook(output, {'in_memory': True})
+        if self._should_run_in_background():
+            return self._enqueue_profitability_job('xlsx')
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/sale_profitability_report/xlsx/%s' % self.id,
+            'target': 'new',
+        }
+
+    @profiled()
+    def _write_profitability_xlsx(self, output, rows=None):
+        """Write the report workbook to the file object ``output``.
+
+        The workbook runs in ``constant_memory`` mode: each row is flushed to
+        a temporary file as soon as the next one starts, so memory use does
+        not grow with the number of orders.
+
+        :param rows: iterable of report rows, defaults to
+                     :meth:`_iter_profitability_data`, which streams them
+                     from keyset pages of orders
+        """
+        self.ensure_one()
+        workbook = xlsxwriter.Workbook(output, {
+            'constant_memory': True,
+            'tmpdir': tempfile.gettempdir(),
+        })
         sheet = workbook.add_worksheet("Sales Profitability")
 
         sheet.set_column(0, 0, 10)
@@ -178,8 +566,9 @@ class SaleProfitabilityWizard(models.TransientModel):
             sheet.write(row, col, header, header_format)
 
         row += 1
-        data = self._get_profitability_data()
-        for rec in data:
+        if rows is None:
+            rows = self._iter_profitability_data()
+        for rec in rows:
             if rec['order'] == 'TOTAL':
                 sheet.write(row, 0, '')
                 sheet.write(row, 1, '')
@@ -201,14 +590,3 @@ class SaleProfitabilityWizard(models.TransientModel):
             row += 1
 
         workbook.close()
-        output.seek(0)
-        file_data = base64.b64encode(output.read())
-        output.close()
-        filename = f"Sales_Profitability.xlsx"
-        self.write({'excel_file': file_data, 'file_name': filename})
-
-        return {
-            'type': 'ir.actions.act_url',
-            'url': '/web/content/?model=%s&id=%s&field=%s&filename=Sales_Profitability.xlsx&download=true' % (self._name, self.id, 'excel_file'),
-            'target': 'new',
-        }